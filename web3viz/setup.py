@@ -7,9 +7,14 @@ setup(
     install_requires=[
         "pandas",
         "matplotlib",
-        "networkx",
+        "networkx>=2.8",
         "requests",
     ],
+    entry_points={
+        "console_scripts": [
+            "web3viz=web3viz.cli:main",
+        ],
+    },
     author="reinex",
     description="Library for Ethereum blockchain data visualization",
     long_description=open("README.md").read(),
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the web3viz command-line tool
+"""
+
+import io
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+
+# Add parent directory to import path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from web3viz import cli
+
+
+GOOD_ADDRESS = "0x742d35cc6634c0532925a3b844bc454e4438f44e"
+BAD_ADDRESS = "0x0000000000000000000000000000000000000bad"
+
+
+def fake_fetch(self, start=None, end=None):
+    """
+    Replacement for fetch_transactions failing for BAD_ADDRESS
+    """
+    if self.address == BAD_ADDRESS:
+        raise Exception("Etherscan API error: NOTOK")
+    self.transactions = pd.DataFrame([
+        {'blockNumber': 1, 'timeStamp': pd.Timestamp('2021-01-01'), 'hash': '0x123',
+         'from': '0xabc', 'to': self.address, 'value': 1.0,
+         'gas': 21000, 'gasPrice': 50.0, 'gasUsed': 21000},
+    ])
+    self._window = (0, 99999999)
+    return self.transactions
+
+
+class TestCli(unittest.TestCase):
+    """
+    Tests for the batch command-line tool
+    """
+
+    def setUp(self):
+        """
+        Test setup
+        """
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """
+        Remove test output
+        """
+        shutil.rmtree(self.output_dir)
+
+    def test_read_addresses(self):
+        """
+        Test reading addresses skips comments, blanks and duplicates
+        """
+        source = io.StringIO(f"# wallets\n{GOOD_ADDRESS}\n\n{GOOD_ADDRESS.upper()}\n{BAD_ADDRESS}\n")
+        self.assertEqual(cli.read_addresses(source), [GOOD_ADDRESS, BAD_ADDRESS.lower()])
+
+    def test_parse_bound(self):
+        """
+        Test window bounds are parsed as blocks or timestamps
+        """
+        self.assertEqual(cli.parse_bound('19000000'), 19000000)
+        self.assertEqual(cli.parse_bound('2024-01-01'), '2024-01-01')
+        self.assertIsNone(cli.parse_bound(None))
+
+    @patch('web3viz.cli.render_wallet')
+    @patch('web3viz.visualizer.WalletVisualizer.fetch_transactions', fake_fetch)
+    def test_run_manifest_and_resume(self, mock_render):
+        """
+        Test the manifest records errors and resume skips completed wallets
+        """
+        mock_render.return_value = ['history.png', 'network.png']
+
+        manifest = cli.run([GOOD_ADDRESS, BAD_ADDRESS], self.output_dir, workers=2)
+
+        self.assertEqual(manifest['wallets'][GOOD_ADDRESS]['status'], 'ok')
+        self.assertEqual(manifest['wallets'][GOOD_ADDRESS]['transactions'], 1)
+        self.assertIsNotNone(manifest['wallets'][GOOD_ADDRESS]['fetch_seconds'])
+        self.assertEqual(manifest['wallets'][BAD_ADDRESS]['status'], 'error')
+        self.assertIn('NOTOK', manifest['wallets'][BAD_ADDRESS]['error'])
+
+        with open(os.path.join(self.output_dir, cli.MANIFEST_NAME)) as f:
+            self.assertEqual(json.load(f)['wallets'], manifest['wallets'])
+
+        # Only the failed wallet is processed again
+        mock_render.reset_mock()
+        resumed = cli.run([GOOD_ADDRESS, BAD_ADDRESS], self.output_dir, workers=2, resume=True)
+        mock_render.assert_not_called()
+        self.assertEqual(resumed['started'], manifest['started'])
+        self.assertIn('resumed', resumed)
+
+        # A different window or format cannot reuse completed charts
+        with self.assertRaises(ValueError):
+            cli.run([GOOD_ADDRESS], self.output_dir, start=100, resume=True)
+        with self.assertRaises(ValueError):
+            cli.run([GOOD_ADDRESS], self.output_dir, output_format='svg', resume=True)
+
+    def test_workers_validation(self):
+        """
+        Test the number of workers must be positive
+        """
+        with self.assertRaises(ValueError):
+            cli.run([GOOD_ADDRESS], self.output_dir, workers=0)
+        with self.assertRaises(SystemExit), patch('sys.stderr'):
+            cli.main([os.devnull, '--workers', '0'])
+
+    @patch('web3viz.visualizer.WalletVisualizer.fetch_transactions', fake_fetch)
+    def test_fetch_wallet_cache(self):
+        """
+        Test fetched transactions are reused from the transaction log
+        """
+        with patch('web3viz.visualizer.WalletVisualizer._latest_block', return_value=1000):
+            cli.fetch_wallet(GOOD_ADDRESS, cache_dir=self.output_dir, end=10)
+
+            with patch('web3viz.visualizer.WalletVisualizer.fetch_transactions') as mock_fetch:
+                cached, _ = cli.fetch_wallet(GOOD_ADDRESS, cache_dir=self.output_dir, end=10)
+                mock_fetch.assert_not_called()
+
+        self.assertIsNone(cached.transactions)
+        self.assertEqual(cached.log.length(GOOD_ADDRESS), 1)
+        self.assertEqual(cached.log.block_range(GOOD_ADDRESS), (0, 10))
+
+    @patch('web3viz.cli.render_wallet')
+    @patch('web3viz.visualizer.WalletVisualizer.fetch_transactions', fake_fetch)
+    @patch('web3viz.visualizer.WalletVisualizer._latest_block', return_value=1000)
+    def test_manifest_counts_window(self, mock_latest, mock_render):
+        """
+        Test the manifest counts transactions of the window, not the whole cache
+        """
+        mock_render.return_value = ['history.png', 'network.png']
+        cache_dir = os.path.join(self.output_dir, 'cache')
+        cli.fetch_wallet(GOOD_ADDRESS, cache_dir=cache_dir, end=10)
+
+        manifest = cli.run([GOOD_ADDRESS], os.path.join(self.output_dir, 'window'),
+                           cache_dir=cache_dir, start=5, end=10)
+        self.assertEqual(manifest['wallets'][GOOD_ADDRESS]['status'], 'ok')
+        self.assertEqual(manifest['wallets'][GOOD_ADDRESS]['transactions'], 0)
+
+        manifest = cli.run([GOOD_ADDRESS], os.path.join(self.output_dir, 'all'),
+                           cache_dir=cache_dir, end=10)
+        self.assertEqual(manifest['wallets'][GOOD_ADDRESS]['transactions'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the TransactionLog class
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+
+# Add parent directory to import path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from web3viz import WalletVisualizer, TransactionLog
+
+
+ADDRESS = "0x742d35cc6634c0532925a3b844bc454e4438f44e"
+
+
+def make_transactions(blocks):
+    """
+    Build transactions in the format of fetch_transactions
+    """
+    return pd.DataFrame([
+        {
+            'blockNumber': block,
+            'timeStamp': pd.Timestamp('2021-01-01') + pd.Timedelta(minutes=block),
+            'hash': f"0x{block:064x}",
+            'from': '0xABC',
+            'to': ADDRESS,
+            'value': float(block),
+            'gas': 21000,
+            'gasPrice': 50.0,
+            'gasUsed': 21000,
+            'nonce': '0',
+        }
+        for block in blocks
+    ])
+
+
+class TestTransactionLog(unittest.TestCase):
+    """
+    Tests for the TransactionLog class
+    """
+
+    def setUp(self):
+        """
+        Test setup
+        """
+        self.root = tempfile.mkdtemp()
+        self.log = TransactionLog(self.root)
+
+    def tearDown(self):
+        """
+        Remove test files
+        """
+        shutil.rmtree(self.root)
+
+    def test_append_and_read(self):
+        """
+        Test appended transactions are read back with their types
+        """
+        self.assertEqual(self.log.append(ADDRESS, make_transactions([1, 2])), 2)
+
+        df = self.log.read(ADDRESS)
+        self.assertEqual(list(df['blockNumber']), [1, 2])
+        self.assertEqual(df.iloc[0]['from'], '0xabc')
+        self.assertEqual(df.iloc[1]['timeStamp'], pd.Timestamp('2021-01-01 00:02'))
+        self.assertEqual(df.iloc[1]['value'], 2.0)
+
+        self.assertNotIn('hash', df.columns)
+
+    def test_read_is_file_backed(self):
+        """
+        Test the columns of the frame used by the plots are the mapped files
+        """
+        self.log.append(ADDRESS, make_transactions(range(1, 300)))
+        df = self.log.read(ADDRESS)
+
+        for column in ['blockNumber', 'value', 'gas', 'gasUsed', 'timeStamp']:
+            array = df[column].to_numpy()
+            mapped = array
+            while not isinstance(mapped, np.memmap):
+                mapped = mapped.base
+            self.assertTrue(mapped.filename.endswith(f"{column}.bin"))
+            self.assertTrue(np.shares_memory(array, mapped))
+
+        # Addresses are categorical, only the small dictionary is decoded
+        self.assertEqual(df['from'].dtype, 'category')
+        self.assertEqual(list(df['from'].cat.categories), ['0xabc', ADDRESS])
+
+    @patch('web3viz.visualizer.plt.savefig')
+    @patch('web3viz.visualizer.plt.close')
+    @patch('web3viz.visualizer.nx.draw_networkx_labels')
+    def test_network_from_mapped_columns(self, mock_labels, mock_close, mock_savefig):
+        """
+        Test the network plot aggregates the mapped columns without building a frame
+        """
+        transactions = make_transactions(range(1, 10))
+        transactions.loc[::2, ['from', 'to']] = [ADDRESS, '0xdef']
+        self.log.append(ADDRESS, transactions)
+
+        pairs = self.log.pair_volumes(ADDRESS, start=2, end=8)
+        self.assertEqual(pairs.loc[(ADDRESS, '0xdef'), 'sum'], 3.0 + 5.0 + 7.0)
+        self.assertEqual(pairs.loc[('0xabc', ADDRESS), 'count'], 4)
+
+        viz = WalletVisualizer(ADDRESS, log=self.log)
+        viz.transactions = self.log.read(ADDRESS)
+        viz._window = (0, 99999999)
+        with patch.object(self.log, 'read') as mock_read, \
+                patch.object(viz, '_pair_volumes') as mock_pairs:
+            viz.plot_address_network(save_path='network.png', fast_edges=True, sync=False)
+            mock_read.assert_not_called()
+            mock_pairs.assert_not_called()
+
+    def test_append_skips_known_transactions(self):
+        """
+        Test overlapping syncs append only new transactions
+        """
+        self.log.append(ADDRESS, make_transactions([1, 2]))
+        reader = self.log.read(ADDRESS)
+
+        appended = self.log.append(ADDRESS, make_transactions([1, 2, 2, 3]).assign(
+            hash=['0x1', f"0x{2:064x}", '0xnew', '0x3']))
+
+        self.assertEqual(appended, 2)
+        self.assertEqual(list(self.log.read(ADDRESS)['blockNumber']), [1, 2, 2, 3])
+        # Earlier readers keep their view
+        self.assertEqual(len(reader), 2)
+
+    def test_length_ignores_partial_append(self):
+        """
+        Test a partially written row is ignored and overwritten
+        """
+        self.log.append(ADDRESS, make_transactions([1]))
+        with open(os.path.join(self.root, ADDRESS, 'value.bin'), 'ab') as f:
+            f.write(b'\x00' * 8)
+
+        self.assertEqual(self.log.length(ADDRESS), 1)
+        self.log.append(ADDRESS, make_transactions([5]))
+        self.assertEqual(list(self.log.read(ADDRESS)['value']), [1.0, 5.0])
+
+    def test_sync_fetches_missing_blocks_only(self):
+        """
+        Test incremental sync starts from the last synced block
+        """
+        viz = WalletVisualizer(ADDRESS)
+
+        def fake_fetch(start=None, end=None):
+            viz.transactions = make_transactions([b for b in (10, 20, 30) if start <= b <= end])
+            return viz.transactions
+
+        with patch.object(viz, 'fetch_transactions', side_effect=fake_fetch) as mock_fetch, \
+                patch.object(viz, '_latest_block', return_value=1000):
+            self.log.sync(viz, start=5, end=20)
+            self.log.sync(viz, start=10, end=15)
+            synced = self.log.sync(viz, start=5, end=40)
+
+        self.assertEqual([c.kwargs for c in mock_fetch.call_args_list],
+                         [{'start': 5, 'end': 20}, {'start': 20, 'end': 40}])
+        self.assertEqual(synced, (5, 40))
+        self.assertEqual(list(self.log.read(ADDRESS)['blockNumber']), [10, 20, 30])
+
+        # Nothing is loaded, the visualizer reads windows from the log
+        self.assertIsNone(viz.transactions)
+        self.assertIs(viz.log, self.log)
+        self.assertEqual(list(viz._load_window(15, 40)['blockNumber']), [20, 30])
+
+    def test_sync_failure_keeps_history(self):
+        """
+        Test a failed fetch while extending into the past keeps the stored history
+        """
+        viz = WalletVisualizer(ADDRESS)
+        with patch.object(viz, '_latest_block', return_value=1000), \
+                patch.object(viz, 'fetch_transactions', return_value=make_transactions([150])):
+            self.log.sync(viz, start=100, end=200)
+
+        with patch.object(viz, '_latest_block', return_value=1000), \
+                patch.object(viz, 'fetch_transactions', side_effect=Exception("Max rate limit reached")):
+            with self.assertRaises(Exception):
+                self.log.sync(viz, start=50, end=200)
+
+        self.assertEqual(self.log.length(ADDRESS), 1)
+        self.assertEqual(self.log.block_range(ADDRESS), (100, 200))
+
+        # Only the blocks before the synced ones are fetched and the stored ones are kept
+        older = make_transactions([60])
+        older['from'] = '0xdef'
+        with patch.object(viz, '_latest_block', return_value=1000), \
+                patch.object(viz, 'fetch_transactions', return_value=older) as mock_fetch:
+            self.log.sync(viz, start=50, end=200)
+        mock_fetch.assert_called_once_with(start=50, end=99)
+        df = self.log.read(ADDRESS)
+        self.assertEqual(list(df['blockNumber']), [60, 150])
+        self.assertEqual(list(df['from']), ['0xdef', '0xabc'])
+        self.assertEqual(list(df['to']), [ADDRESS, ADDRESS])
+        self.assertEqual(self.log.rollup(ADDRESS, 'month')['count'].sum(), 2)
+        self.assertEqual(self.log.block_range(ADDRESS), (50, 200))
+        self.assertFalse(os.path.exists(os.path.join(self.root, ADDRESS + '.old')))
+
+    def test_sync_empty_range_and_chain_head(self):
+        """
+        Test quiet ranges sync without error and blocks past the chain head stay unsynced
+        """
+        viz = WalletVisualizer(ADDRESS)
+        with patch.object(viz, '_latest_block', return_value=250), \
+                patch.object(viz, 'fetch_transactions', return_value=pd.DataFrame()) as mock_fetch:
+            self.log.sync(viz, start=100, end=200)
+            self.log.sync(viz, start=100, end=300)
+            self.assertEqual(self.log.block_range(ADDRESS), (100, 250))
+            self.assertEqual(mock_fetch.call_args.kwargs, {'start': 200, 'end': 250})
+
+            # Nothing new before the chain head moves on
+            self.log.sync(viz, start=100, end=300)
+            self.assertEqual(mock_fetch.call_count, 2)
+
+            with patch.object(viz, '_latest_block', return_value=280):
+                self.log.sync(viz, start=50, end=300)
+            self.assertEqual([c.kwargs for c in mock_fetch.call_args_list[2:]],
+                             [{'start': 50, 'end': 99}, {'start': 250, 'end': 280}])
+        self.assertEqual(self.log.block_range(ADDRESS), (50, 280))
+        self.assertEqual(self.log.length(ADDRESS), 0)
+
+    def test_writers_exclude_readers(self):
+        """
+        Test readers wait for a writer holding the wallet lock
+        """
+        self.log.append(ADDRESS, make_transactions([1]))
+        done = threading.Event()
+
+        def reader():
+            self.log.columns(ADDRESS)
+            done.set()
+
+        with self.log._locked(ADDRESS):
+            thread = threading.Thread(target=reader)
+            thread.start()
+            self.assertFalse(done.wait(0.2))
+        self.assertTrue(done.wait(5))
+        thread.join()
+
+
+    def test_rollups_incremental(self):
+        """
+        Test rollups maintained across appends match the raw transactions
+        """
+        transactions = make_transactions(range(1, 200, 7))
+        transactions.loc[::2, ['from', 'to']] = [ADDRESS, '0xdef']
+        self.log.append(ADDRESS, transactions.iloc[:10])
+        self.log.append(ADDRESS, transactions.iloc[10:])
+
+        hourly = self.log.rollup(ADDRESS, 'hour')
+        self.assertEqual(list(hourly.index), [pd.Timestamp('2021-01-01 00:00'),
+                                              pd.Timestamp('2021-01-01 01:00'),
+                                              pd.Timestamp('2021-01-01 02:00'),
+                                              pd.Timestamp('2021-01-01 03:00')])
+        self.assertEqual(hourly['count'].sum(), len(transactions))
+        self.assertEqual(hourly['volume'].sum(), transactions['value'].sum())
+        self.assertEqual(hourly['out_volume'].sum(), transactions['value'].iloc[::2].sum())
+        self.assertEqual(hourly['in_count'].sum(), len(transactions.iloc[1::2]))
+        self.assertAlmostEqual(hourly['gas_fee'].sum(), len(transactions) * 21000 * 50.0 / 1e9)
+
+        weekly = self.log.rollup(ADDRESS, 'week')
+        self.assertEqual(list(weekly.index), [pd.Timestamp('2020-12-28')])
+        self.assertEqual(weekly.iloc[0]['count'], len(transactions))
+
+        window = self.log.rollup(ADDRESS, 'hour', start='2021-01-01 01:30', end='2021-01-01 02:00')
+        self.assertEqual(len(window), 2)
+
+        with self.assertRaises(ValueError):
+            self.log.rollup(ADDRESS, 'year')
+
+    def test_rollups_interrupted_update(self):
+        """
+        Test an interrupted rollup update never counts transactions twice
+        """
+        self.log.append(ADDRESS, make_transactions(range(1, 10)))
+
+        # Fail after the first table of the next update was saved
+        save_rollup = self.log._save_rollup
+        saved = []
+
+        def failing_save(*args):
+            if saved:
+                raise OSError("No space left on device")
+            saved.append(args)
+            save_rollup(*args)
+
+        with patch.object(self.log, '_save_rollup', side_effect=failing_save):
+            with self.assertRaises(OSError):
+                self.log.append(ADDRESS, make_transactions(range(10, 20)))
+
+        # Readers aggregate the uncovered rows on the fly without writing
+        with patch.object(self.log, '_save_rollup') as mock_save:
+            for resolution in ['hour', 'day', 'week', 'month']:
+                self.assertEqual(self.log.rollup(ADDRESS, resolution)['count'].sum(), 19)
+            mock_save.assert_not_called()
+
+        self.log.update_rollups(ADDRESS)
+        self.log.update_rollups(ADDRESS)
+        for resolution in ['hour', 'day', 'week', 'month']:
+            self.assertEqual(self.log.rollup(ADDRESS, resolution)['count'].sum(), 19)
+
+    @patch('web3viz.visualizer.plt.savefig')
+    @patch('web3viz.visualizer.plt.close')
+    @patch('web3viz.visualizer.nx.draw_networkx_labels')
+    @patch('web3viz.visualizer.requests.get', side_effect=AssertionError("Unexpected API call"))
+    @patch('web3viz.visualizer.WalletVisualizer.fetch_transactions',
+           side_effect=AssertionError("Unexpected fetch"))
+    def test_plot_from_log_without_fetching(self, mock_fetch, mock_get, mock_labels,
+                                            mock_close, mock_savefig):
+        """
+        Test charts can be drawn from the stored transactions without API calls
+        """
+        transactions = make_transactions([1, 2, 3])
+        transactions.loc[0, ['from', 'to']] = [ADDRESS, '0xdef']
+        self.log.append(ADDRESS, transactions)
+        viz = WalletVisualizer(ADDRESS, log=self.log)
+
+        with patch.object(self.log, 'read', side_effect=AssertionError("Unexpected read")):
+            result = viz.plot_transaction_history(save_path='history.png', start='2021-01-01',
+                                                  end='2021-01-01', resolution='auto', sync=False)
+            self.assertEqual(result, 'history.png')
+            viz.plot_transaction_history(save_path='history.png', sync=False)
+            viz.plot_address_network(save_path='network.png', start='2021-01-01', fast_edges=True,
+                                     sync=False)
+
+        self.assertIsNone(viz.transactions)
+        self.assertEqual(mock_savefig.call_count, 3)
+
+    @patch('web3viz.visualizer.plt.savefig')
+    @patch('web3viz.visualizer.plt.close')
+    @patch('web3viz.visualizer.nx.draw_networkx_labels')
+    def test_plot_syncs_uncovered_window(self, mock_labels, mock_close, mock_savefig):
+        """
+        Test charts sync by default when the log does not cover the window
+        """
+        viz = WalletVisualizer(ADDRESS, log=self.log)
+        with patch.object(viz, '_latest_block', return_value=1000), \
+                patch.object(viz, 'fetch_transactions', return_value=make_transactions([1, 2, 3])):
+            self.assertEqual(viz.plot_transaction_history(save_path='history.png'), 'history.png')
+        self.assertEqual(self.log.block_range(ADDRESS), (0, 1000))
+
+        # History and network charts follow the same rule for every kind of bound
+        for start in ['2021-01-01', 1]:
+            for covered, calls in [((0, 500), 0), ((0, 2000), 2)]:
+                with patch.object(viz, '_resolve_window', return_value=covered), \
+                        patch.object(self.log, 'sync') as mock_sync:
+                    viz.plot_transaction_history(save_path='history.png', start=start)
+                    viz.plot_address_network(save_path='network.png', start=start, fast_edges=True)
+                    self.assertEqual(mock_sync.call_count, calls)
+
+    def test_auto_resolution_clamped_to_data(self):
+        """
+        Test a window starting long before the wallet's activity keeps a fine resolution
+        """
+        self.log.append(ADDRESS, make_transactions(range(1, 100)))
+        viz = WalletVisualizer(ADDRESS, log=self.log)
+
+        self.assertEqual(viz._auto_resolution('2015-01-01', '2021-12-31'), 'hour')
+        self.assertEqual(viz._auto_resolution(1, 50), 'hour')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,7 @@ import os
 import sys
 import unittest
 from unittest.mock import patch, MagicMock
+import numpy as np
 import pandas as pd
 
 # Add parent directory to import path
@@ -105,6 +106,134 @@ class TestWalletVisualizer(unittest.TestCase):
         with self.assertRaises(Exception):
             viz.fetch_transactions()
     
+    @patch('web3viz.visualizer.requests.get')
+    def test_fetch_transactions_window(self, mock_get):
+        """
+        Test fetching a time window maps timestamps to blocks once
+        """
+        block_response = MagicMock()
+        block_response.json.return_value = {'status': '1', 'message': 'OK', 'result': '13000000'}
+        tx_response = MagicMock()
+        tx_response.json.return_value = {
+            'status': '1',
+            'message': 'OK',
+            'result': [
+                {
+                    'blockNumber': '14000000',
+                    'timeStamp': '1639000000',
+                    'hash': '0x123',
+                    'from': '0xabc',
+                    'to': self.valid_address.lower(),
+                    'value': '1000000000000000000',
+                    'gas': '21000',
+                    'gasPrice': '50000000000',
+                    'gasUsed': '21000',
+                }
+            ]
+        }
+        mock_get.side_effect = [block_response, tx_response, tx_response]
+        
+        viz = WalletVisualizer(self.valid_address)
+        viz.fetch_transactions(start='2021-08-01', end=14500000)
+        viz.fetch_transactions(start='2021-08-01', end=14500000)
+        
+        # Timestamp is resolved only on the first call
+        self.assertEqual(mock_get.call_count, 3)
+        block_params = mock_get.call_args_list[0][1]['params']
+        self.assertEqual(block_params['action'], 'getblocknobytime')
+        self.assertEqual(block_params['closest'], 'after')
+        tx_params = mock_get.call_args_list[2][1]['params']
+        self.assertEqual(tx_params['startblock'], 13000000)
+        self.assertEqual(tx_params['endblock'], 14500000)
+    
+    def test_load_window_slices_loaded_data(self):
+        """
+        Test that a window inside the loaded range is served without fetching
+        """
+        viz = WalletVisualizer(self.valid_address)
+        viz.transactions = pd.DataFrame([
+            {'blockNumber': 100, 'timeStamp': pd.Timestamp('2021-01-01'), 'value': 1.0},
+            {'blockNumber': 200, 'timeStamp': pd.Timestamp('2021-01-02'), 'value': 2.0},
+            {'blockNumber': 300, 'timeStamp': pd.Timestamp('2021-01-03'), 'value': 3.0},
+        ])
+        viz._window = (0, 99999999)
+        
+        with patch.object(viz, 'fetch_transactions') as mock_fetch:
+            by_block = viz._load_window(start=150, end=300)
+            by_time = viz._load_window(end=pd.Timestamp('2021-01-01 12:00'))
+            mock_fetch.assert_not_called()
+        
+        self.assertEqual(list(by_block['value']), [2.0, 3.0])
+        self.assertEqual(list(by_time['value']), [1.0])
+    
+    def test_load_window_refetches_full_history(self):
+        """
+        Test an unbounded request after a windowed load fetches the full history
+        """
+        viz = WalletVisualizer(self.valid_address)
+        viz.transactions = pd.DataFrame([
+            {'blockNumber': 150, 'timeStamp': pd.Timestamp('2021-01-01'), 'value': 1.0},
+        ])
+        viz._window = (100, 99999999)
+        
+        with patch.object(viz, 'fetch_transactions') as mock_fetch:
+            viz._load_window(start=120)
+            mock_fetch.assert_not_called()
+            viz._load_window()
+            mock_fetch.assert_called_once_with(start=None, end=None)
+    
+    @patch('web3viz.visualizer.requests.get')
+    def test_fetch_empty_window(self, mock_get):
+        """
+        Test an empty block range gives an empty frame instead of an API error
+        """
+        mock_response = MagicMock()
+        mock_response.json.return_value = {'status': '0', 'message': 'No transactions found', 'result': []}
+        mock_get.return_value = mock_response
+        
+        viz = WalletVisualizer(self.valid_address)
+        self.assertTrue(viz.fetch_transactions(start=1, end=2).empty)
+        self.assertEqual(viz._window, (1, 2))
+        
+        with self.assertRaises(ValueError):
+            viz.plot_address_network(start=1, end=2)
+        # The empty window is remembered
+        self.assertEqual(mock_get.call_count, 1)
+    
+    def test_date_only_end_covers_whole_day(self):
+        """
+        Test a date without time as the window end includes that day
+        """
+        viz = WalletVisualizer(self.valid_address)
+        transactions = pd.DataFrame([
+            {'timeStamp': pd.Timestamp('2024-01-31 18:00'), 'value': 1.0},
+            {'timeStamp': pd.Timestamp('2024-02-01 00:00'), 'value': 2.0},
+        ])
+        
+        window = viz._slice_window(transactions, start='2024-01-01', end='2024-01-31')
+        self.assertEqual(list(window['value']), [1.0])
+        window = viz._slice_window(transactions, end=pd.Timestamp('2024-01-31'))
+        self.assertTrue(window.empty)
+    
+    @patch('web3viz.visualizer.plt.savefig')
+    @patch('web3viz.visualizer.plt.close')
+    def test_auto_resolution_of_block_window(self, mock_close, mock_savefig):
+        """
+        Test the automatic resolution follows the block window, not all loaded data
+        """
+        viz = WalletVisualizer(self.valid_address)
+        viz.transactions = pd.DataFrame([
+            {'blockNumber': block, 'timeStamp': pd.Timestamp('2020-01-01') + pd.Timedelta(hours=block),
+             'value': 1.0}
+            for block in [0, 1, 2, 20000]
+        ])
+        viz._window = (0, 99999999)
+        
+        self.assertEqual(viz._auto_resolution(0, 2, viz._slice_window(viz.transactions, 0, 2)), 'hour')
+        with patch.object(viz, '_auto_resolution', wraps=viz._auto_resolution) as mock_auto:
+            viz.plot_transaction_history(save_path='history.png', start=0, end=2, resolution='auto')
+        self.assertEqual(len(mock_auto.call_args[0][2]), 3)
+    
     @patch('web3viz.visualizer.plt.savefig')
     @patch('web3viz.visualizer.plt.subplots')
     @patch('web3viz.visualizer.plt.figure')
@@ -189,6 +318,129 @@ class TestWalletVisualizer(unittest.TestCase):
         self.assertEqual(result, 'test_network.png')
         mock_savefig.assert_called_once()
 
+    
+    def test_prune_and_merge_edges(self):
+        """
+        Test edge pruning and merging of opposite edges
+        """
+        import networkx as nx
+        
+        G = nx.DiGraph()
+        G.add_edge('0xa', '0xb', weight=5.0, count=2)
+        G.add_edge('0xb', '0xa', weight=2.0, count=1)
+        G.add_edge('0xa', '0xc', weight=0.1, count=1)
+        
+        WalletVisualizer._prune_edges(G, min_edge_weight=1.0)
+        self.assertFalse(G.has_edge('0xa', '0xc'))
+        
+        merged = WalletVisualizer._merge_reverse_edges(G)
+        self.assertEqual(merged.number_of_edges(), 1)
+        data = merged.get_edge_data('0xa', '0xb')
+        self.assertEqual(data['weight'], 7.0)
+        self.assertEqual(data['net'], 3.0)
+        self.assertEqual(data['count'], 3)
+        self.assertTrue(data['bidirectional'])
+    
+    @patch('web3viz.visualizer.plt.savefig')
+    @patch('web3viz.visualizer.plt.close')
+    @patch('web3viz.visualizer.nx.draw_networkx_edges')
+    def test_plot_address_network_fast_edges(self, mock_edges, mock_close, mock_savefig):
+        """
+        Test network plotting with a single edge collection
+        """
+        mock_df = pd.DataFrame([
+            {'value': 1.0, 'from': '0xabc', 'to': self.valid_address.lower()},
+            {'value': 2.0, 'from': self.valid_address.lower(), 'to': '0xabc'},
+            {'value': 0.5, 'from': self.valid_address.lower(), 'to': '0xdef'},
+        ])
+        
+        viz = WalletVisualizer(self.valid_address)
+        viz.transactions = mock_df
+        with patch.object(WalletVisualizer, '_draw_edge_collection',
+                          wraps=WalletVisualizer._draw_edge_collection) as mock_collection:
+            result = viz.plot_address_network(save_path='test_network.png', fast_edges=True,
+                                              merge_reverse=True, edge_percentile=10)
+        
+        self.assertEqual(result, 'test_network.png')
+        mock_edges.assert_not_called()
+        mock_savefig.assert_called_once()
+        
+        # Merged edge width follows the net flow (2.0 - 1.0)
+        G, _, widths = mock_collection.call_args[0]
+        self.assertIn(np.log1p(1.0) * 0.5, widths)
+        self.assertTrue(G.has_edge(self.valid_address.lower(), '0xabc'))
+    
+    @patch('web3viz.visualizer.plt.savefig')
+    @patch('web3viz.visualizer.plt.close')
+    def test_merge_before_pruning(self, mock_close, mock_savefig):
+        """
+        Test a weak direction still counts towards the net flow of a merged edge
+        """
+        wallet = self.valid_address.lower()
+        viz = WalletVisualizer(self.valid_address)
+        viz.transactions = pd.DataFrame([
+            {'value': 10.0, 'from': wallet, 'to': '0xabc'},
+            {'value': 9.0, 'from': '0xabc', 'to': wallet},
+        ])
+        with patch.object(WalletVisualizer, '_draw_edge_collection') as mock_collection:
+            viz.plot_address_network(save_path='test_network.png', fast_edges=True,
+                                     merge_reverse=True, min_edge_weight=9.5)
+        
+        G = mock_collection.call_args[0][0]
+        data = G.get_edge_data(wallet, '0xabc')
+        self.assertEqual(data['net'], 1.0)
+        self.assertEqual(data['weight'], 19.0)
+        self.assertTrue(data['bidirectional'])
+
+    
+    @patch('web3viz.visualizer.plt.savefig')
+    @patch('web3viz.visualizer.plt.close')
+    def test_collapse_communities(self, mock_close, mock_savefig):
+        """
+        Test community detection and collapsing into super-nodes
+        """
+        wallet = self.valid_address.lower()
+        viz = WalletVisualizer(self.valid_address)
+        # A transaction list only holds transactions of the wallet itself
+        rows = []
+        for i, value in enumerate([0.1, 0.12, 0.09]):
+            rows.append({'value': value, 'from': f'0xa{i}', 'to': wallet})
+        for i, value in enumerate([40.0, 50.0, 45.0]):
+            rows.append({'value': value, 'from': wallet, 'to': f'0xb{i}'})
+        for i in range(3):
+            rows += [{'value': 1.0, 'from': f'0xc{i}', 'to': wallet},
+                     {'value': 1.0, 'from': wallet, 'to': f'0xc{i}'}] * 5
+        viz.transactions = pd.DataFrame(rows)
+        
+        G = viz._build_network_graph(viz._pair_volumes(viz.transactions))
+        small_senders, large_recipients, regulars = ({'0xa0', '0xa1', '0xa2'}, {'0xb0', '0xb1', '0xb2'},
+                                                     {'0xc0', '0xc1', '0xc2'})
+        for method in ['louvain', 'label_propagation']:
+            communities = viz._detect_communities(G, method)
+            self.assertEqual(communities, [large_recipients, regulars, small_senders])
+        
+        collapsed = viz._collapse_communities(G, communities)
+        self.assertEqual(collapsed.number_of_nodes(), 4)
+        group = next(n for n, d in collapsed.nodes(data=True) if d.get('members') == small_senders)
+        self.assertAlmostEqual(collapsed.nodes[group]['volume'], 0.31)
+        self.assertEqual(collapsed.nodes[group]['count'], 3)
+        self.assertAlmostEqual(collapsed[group][wallet]['weight'], 0.31)
+        self.assertFalse(collapsed.has_edge(wallet, group))
+        
+        with self.assertRaises(ValueError):
+            viz._detect_communities(G, 'unknown')
+        
+        with self.assertRaises(ValueError) as context:
+            viz.plot_address_network(communities='label_propagation', community=5)
+        self.assertIn('3 communities', str(context.exception))
+        
+        # Drilling into a community keeps the top max_addresses members
+        with patch.object(WalletVisualizer, '_draw_edge_collection') as mock_collection:
+            viz.plot_address_network(save_path='test_network.png', fast_edges=True,
+                                     communities='louvain', community=0, max_addresses=2)
+        drawn = mock_collection.call_args[0][0]
+        self.assertEqual(set(drawn.nodes()), {wallet, '0xb1', '0xb2'})
+
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -1,3 +1,4 @@
 from .visualizer import WalletVisualizer
+from .store import TransactionLog
 
 __version__ = "0.1.0"
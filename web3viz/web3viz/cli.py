@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Command-line tool for batch visualization of Ethereum wallets
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import matplotlib.pyplot as plt
+
+from .visualizer import WalletVisualizer
+from .store import TransactionLog
+
+
+MANIFEST_NAME = "manifest.json"
+
+
+def parse_bound(value):
+    """
+    Parse a window bound from the command line
+
+    Args:
+        value (str): Block number or timestamp (e.g. 2024-01-31)
+
+    Returns:
+        int or str: Block number or timestamp string
+    """
+    if value is None:
+        return None
+    return int(value) if value.isdigit() else value
+
+
+def positive_int(value):
+    """
+    Parse a positive integer from the command line
+
+    Args:
+        value (str): Command-line value
+
+    Returns:
+        int: Parsed value
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def read_addresses(source):
+    """
+    Read wallet addresses, one per line
+
+    Empty lines and lines starting with '#' are skipped.
+
+    Args:
+        source (file): Open file with addresses
+
+    Returns:
+        list: Unique addresses in input order
+    """
+    addresses = []
+    for line in source:
+        address = line.strip().lower()
+        if address and not address.startswith('#') and address not in addresses:
+            addresses.append(address)
+    return addresses
+
+
+def load_manifest(path):
+    """
+    Load the manifest of a previous run
+
+    Args:
+        path (str): Path to manifest file
+
+    Returns:
+        dict: Manifest, empty if the file does not exist
+    """
+    if not os.path.exists(path):
+        return {"wallets": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path):
+    """
+    Write the manifest atomically, so an interrupted run leaves a valid file
+
+    Args:
+        manifest (dict): Manifest
+        path (str): Path to manifest file
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def fetch_wallet(address, api_key=None, cache_dir=None, start=None, end=None):
+    """
+    Fetch transactions for a wallet (fetch stage of the pipeline)
+
+    With a cache directory, transactions are kept in a shared TransactionLog,
+    only blocks missing from it are fetched and history charts use its rollups.
+
+    Args:
+        address (str): Ethereum wallet address
+        api_key (str, optional): Etherscan API key
+        cache_dir (str, optional): Directory of the transaction log
+        start (int or str, optional): First block or earliest time
+        end (int or str, optional): Last block or latest time
+
+    Returns:
+        tuple: (WalletVisualizer, fetch time in seconds)
+    """
+    started = time.perf_counter()
+    log = TransactionLog(cache_dir) if cache_dir else None
+    viz = WalletVisualizer(address, api_key=api_key, log=log)
+
+    if log is not None:
+        log.sync(viz, start=start, end=end)
+    else:
+        viz.fetch_transactions(start=start, end=end)
+
+    return viz, time.perf_counter() - started
+
+
+def count_transactions(viz, start=None, end=None):
+    """
+    Count fetched transactions within the window
+
+    With a transaction log, the stored history can be larger than the window,
+    so only rows within the window are counted.
+
+    Args:
+        viz (WalletVisualizer): Visualizer with fetched transactions
+        start (int or str, optional): First block or earliest time
+        end (int or str, optional): Last block or latest time
+
+    Returns:
+        int: Number of transactions
+    """
+    if viz.log is not None:
+        return len(viz.log.window(viz.address, start, end, ["blockNumber"])["blockNumber"])
+    if viz.transactions is None or viz.transactions.empty:
+        return 0
+    return len(viz._slice_window(viz.transactions, start, end))
+
+
+def render_wallet(viz, output_dir, output_format="png", start=None, end=None):
+    """
+    Render charts for a fetched wallet (render stage of the pipeline)
+
+    Args:
+        viz (WalletVisualizer): Visualizer with loaded transactions
+        output_dir (str): Directory for saving results
+        output_format (str, optional): Image format (png, svg, pdf)
+        start (int or str, optional): First block or earliest time
+        end (int or str, optional): Last block or latest time
+
+    Returns:
+        list: Paths to saved charts
+    """
+    # The fetch stage already synced the window
+    history_path = os.path.join(output_dir, f"{viz.address}_history.{output_format}")
+    viz.plot_transaction_history(save_path=history_path, start=start, end=end, sync=False)
+
+    network_path = os.path.join(output_dir, f"{viz.address}_network.{output_format}")
+    viz.plot_address_network(save_path=network_path, start=start, end=end, fast_edges=True, sync=False)
+
+    return [history_path, network_path]
+
+
+def run(addresses, output_dir, api_key=None, workers=4, cache_dir=None,
+        output_format="png", start=None, end=None, resume=False):
+    """
+    Visualize a batch of wallets
+
+    Transactions are fetched by a pool of worker threads while the main thread
+    renders already fetched wallets. Progress is saved to a manifest after each
+    wallet, so an interrupted run can be resumed.
+
+    Args:
+        addresses (list): Ethereum wallet addresses
+        output_dir (str): Directory for saving results and manifest
+        api_key (str, optional): Etherscan API key
+        workers (int, optional): Number of fetch workers
+        cache_dir (str, optional): Directory of the transaction log
+        output_format (str, optional): Image format (png, svg, pdf)
+        start (int or str, optional): First block or earliest time
+        end (int or str, optional): Last block or latest time
+        resume (bool, optional): Skip wallets completed by a previous run
+            with the same window and format
+
+    Returns:
+        dict: Manifest with per-wallet timings and errors
+    """
+    if workers < 1:
+        raise ValueError(f"Number of workers must be at least 1, got {workers}")
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    params = {"start": start, "end": end, "format": output_format}
+    now = datetime.now().isoformat()
+
+    manifest = load_manifest(manifest_path) if resume else {"wallets": {}}
+    if manifest["wallets"]:
+        # Charts of completed wallets must match the requested window and format
+        if manifest.get("params") != params:
+            raise ValueError(f"Cannot resume: previous run used {manifest.get('params')}, "
+                             f"this run requests {params}")
+        manifest["resumed"] = now
+    else:
+        manifest.update({"params": params, "started": now})
+    manifest.pop("finished", None)
+
+    os.makedirs(output_dir, exist_ok=True)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    pending = [address for address in addresses
+               if manifest["wallets"].get(address, {}).get("status") != "ok"]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Keep a bounded number of fetches ahead of rendering
+        queue = deque()
+        remaining = iter(pending)
+
+        def submit_next():
+            address = next(remaining, None)
+            if address is not None:
+                queue.append((address, executor.submit(
+                    fetch_wallet, address, api_key, cache_dir, start, end)))
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        while queue:
+            address, future = queue.popleft()
+            submit_next()
+
+            entry = {"status": "error", "fetch_seconds": None, "render_seconds": None,
+                     "transactions": None, "outputs": [], "error": None}
+            try:
+                viz, entry["fetch_seconds"] = future.result()
+                entry["transactions"] = count_transactions(viz, start, end)
+
+                started = time.perf_counter()
+                entry["outputs"] = render_wallet(viz, output_dir, output_format, start, end)
+                entry["render_seconds"] = time.perf_counter() - started
+                entry["status"] = "ok"
+            except Exception as e:
+                entry["error"] = str(e)
+                plt.close("all")
+
+            manifest["wallets"][address] = entry
+            save_manifest(manifest, manifest_path)
+            print(f"{address}: {entry['status']}" + (f" ({entry['error']})" if entry["error"] else ""))
+
+    manifest["finished"] = datetime.now().isoformat()
+    save_manifest(manifest, manifest_path)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Batch Ethereum wallet visualization')
+    parser.add_argument('addresses', nargs='?', default='-',
+                        help='File with one address per line (default: stdin)')
+    parser.add_argument('--api-key', help='Etherscan API key (optional)')
+    parser.add_argument('--output-dir', default='output', help='Directory for saving results')
+    parser.add_argument('--workers', type=positive_int, default=4, help='Number of fetch workers')
+    parser.add_argument('--cache-dir', help='Directory of the shared transaction log')
+    parser.add_argument('--format', dest='output_format', default='png',
+                        choices=['png', 'svg', 'pdf'], help='Output image format')
+    parser.add_argument('--start', help='First block number or earliest time (e.g. 2024-01-01)')
+    parser.add_argument('--end', help='Last block number or latest time')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip wallets completed by a previous run in the output directory '
+                             '(requires the same --start, --end and --format)')
+    args = parser.parse_args(argv)
+
+    # Render without a display
+    plt.switch_backend('Agg')
+
+    if args.addresses == '-':
+        addresses = read_addresses(sys.stdin)
+    else:
+        with open(args.addresses) as f:
+            addresses = read_addresses(f)
+
+    try:
+        manifest = run(addresses, args.output_dir, api_key=args.api_key, workers=args.workers,
+                       cache_dir=args.cache_dir, output_format=args.output_format,
+                       start=parse_bound(args.start), end=parse_bound(args.end), resume=args.resume)
+    except ValueError as e:
+        parser.error(str(e))
+
+    failed = [a for a, entry in manifest["wallets"].items() if entry["status"] != "ok"]
+    print(f"Processed {len(manifest['wallets'])} wallets, {len(failed)} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
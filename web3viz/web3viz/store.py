@@ -0,0 +1,698 @@
+import os
+import json
+import shutil
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, the log is then not locked
+    fcntl = None
+
+from .visualizer import WalletVisualizer, DEFAULT_END_BLOCK, RESOLUTIONS, period_start
+
+
+# Stored columns and their on-disk types
+COLUMNS = {
+    "blockNumber": np.dtype("<i8"),
+    "timeStamp": np.dtype("<i8"),  # Seconds since epoch
+    "hash": np.dtype("S66"),
+    "from": np.dtype("<i4"),  # Code in the wallet's address dictionary
+    "to": np.dtype("<i4"),
+    "value": np.dtype("<f8"),
+    "gas": np.dtype("<i8"),
+    "gasPrice": np.dtype("<f8"),
+    "gasUsed": np.dtype("<i8"),
+}
+
+# Columns stored as codes of the address dictionary
+ADDRESS_COLUMNS = ("from", "to")
+ADDRESS_DTYPE = np.dtype("S42")
+
+# Columns loaded by read() unless requested otherwise
+READ_COLUMNS = [column for column in COLUMNS if column != "hash"]
+
+# Aggregates kept per rollup period
+ROLLUP_FIELDS = ["volume", "count", "gas_fee", "in_volume", "in_count", "out_volume", "out_count"]
+
+
+class TransactionLog:
+    """
+    Append-only on-disk log of wallet transactions
+
+    Every wallet has a directory with one raw binary file per column. Readers map
+    the files into memory, so several processes can share one copy of a wallet's
+    history through the OS page cache. Addresses are stored as integer codes into
+    a per-wallet address dictionary, which is mapped as well. New transactions
+    are appended to the end of the files and become visible to the next read
+    without rewriting them.
+
+    Writers hold an exclusive per-wallet lock, readers a shared one while mapping.
+    """
+
+    def __init__(self, root):
+        """
+        Initialize the log
+
+        Args:
+            root (str): Directory for the log files
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _wallet_dir(self, address):
+        """
+        Directory holding the files of a wallet
+        """
+        return os.path.join(self.root, address.lower())
+
+    def _column_path(self, address, column):
+        """
+        Path of a column file
+        """
+        return os.path.join(self._wallet_dir(address), f"{column}.bin")
+
+    def _addresses_path(self, address):
+        """
+        Path of the address dictionary
+        """
+        return os.path.join(self._wallet_dir(address), "addresses.bin")
+
+    def _meta_path(self, address):
+        """
+        Path of the file describing the synced block range
+        """
+        return os.path.join(self._wallet_dir(address), "meta.json")
+
+    def _rollup_path(self, address, resolution):
+        """
+        Path of a rollup table
+        """
+        return os.path.join(self._wallet_dir(address), f"rollup_{resolution}.npz")
+
+    @contextmanager
+    def _locked(self, address, shared=False):
+        """
+        Hold the per-wallet lock
+
+        Args:
+            address (str): Ethereum wallet address
+            shared (bool, optional): Take a shared (reader) lock instead of an exclusive one
+        """
+        with open(os.path.join(self.root, f"{address.lower()}.lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                if not shared:
+                    self._recover(address)
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _recover(self, address):
+        """
+        Finish a rewrite of the wallet's files interrupted during the swap
+        """
+        wallet_dir = self._wallet_dir(address)
+        old_dir = wallet_dir + ".old"
+        if os.path.isdir(old_dir):
+            if os.path.isdir(wallet_dir):
+                shutil.rmtree(old_dir)
+            else:
+                os.rename(old_dir, wallet_dir)
+
+    def length(self, address):
+        """
+        Get the number of stored transactions for a wallet
+
+        A partially written append is ignored, the shortest column wins.
+
+        Args:
+            address (str): Ethereum wallet address
+
+        Returns:
+            int: Number of transactions
+        """
+        lengths = []
+        for column, dtype in COLUMNS.items():
+            path = self._column_path(address, column)
+            if not os.path.exists(path):
+                return 0
+            lengths.append(os.path.getsize(path) // dtype.itemsize)
+        return min(lengths)
+
+    def _address_count(self, address):
+        """
+        Number of complete entries in the address dictionary
+        """
+        path = self._addresses_path(address)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // ADDRESS_DTYPE.itemsize
+
+    def block_range(self, address):
+        """
+        Get the block range synced for a wallet
+
+        Args:
+            address (str): Ethereum wallet address
+
+        Returns:
+            tuple or None: (start_block, end_block), None if nothing was synced
+        """
+        path = self._meta_path(address)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            meta = json.load(f)
+        return meta["start_block"], meta["end_block"]
+
+    def _set_block_range(self, address, start_block, end_block):
+        """
+        Atomically store the synced block range of a wallet
+        """
+        path = self._meta_path(address)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"start_block": start_block, "end_block": end_block}, f)
+        os.replace(path + ".tmp", path)
+
+    def _map(self, path, dtype, n):
+        """
+        Map the first n items of a file
+        """
+        if n == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(n,))
+
+    def columns(self, address, columns=None):
+        """
+        Map stored columns into memory without copying
+
+        Address columns hold codes into addresses().
+
+        Args:
+            address (str): Ethereum wallet address
+            columns (list, optional): Columns to map (default: all)
+
+        Returns:
+            dict: Read-only numpy memmap per column
+        """
+        with self._locked(address, shared=True):
+            return self._columns(address, columns)
+
+    def _columns(self, address, columns=None):
+        """
+        Map stored columns, the caller holds the lock
+        """
+        n = self.length(address)
+        return {column: self._map(self._column_path(address, column), COLUMNS[column], n)
+                for column in columns or COLUMNS}
+
+    def addresses(self, address):
+        """
+        Map the address dictionary of a wallet
+
+        Args:
+            address (str): Ethereum wallet address
+
+        Returns:
+            numpy.ndarray: Lowercase addresses as bytes, indexed by code
+        """
+        with self._locked(address, shared=True):
+            return self._addresses(address)
+
+    def _addresses(self, address):
+        """
+        Map the address dictionary, the caller holds the lock
+        """
+        return self._map(self._addresses_path(address), ADDRESS_DTYPE, self._address_count(address))
+
+    def window(self, address, start=None, end=None, columns=None):
+        """
+        Map the stored columns of a window without copying
+
+        Transactions are stored in block order, so a window is a contiguous
+        range of rows found by binary search.
+
+        Args:
+            address (str): Ethereum wallet address
+            start (int, str, datetime or pandas.Timestamp, optional): First block or earliest time
+            end (int, str, datetime or pandas.Timestamp, optional): Last block or latest time
+            columns (list, optional): Columns to map (default: all)
+
+        Returns:
+            dict: Read-only numpy memmap slice per column
+        """
+        with self._locked(address, shared=True):
+            return self._window(address, start, end, columns)
+
+    def _window(self, address, start=None, end=None, columns=None):
+        """
+        Map the columns of a window, the caller holds the lock
+        """
+        arrays = self._columns(address, list(set(columns or COLUMNS) | {"blockNumber", "timeStamp"}))
+        first, last = 0, len(arrays["blockNumber"])
+        if start is not None:
+            if WalletVisualizer._is_block(start):
+                first = np.searchsorted(arrays["blockNumber"], int(start), side="left")
+            else:
+                seconds = int(np.ceil(WalletVisualizer._to_timestamp(start).value / 1e9))
+                first = np.searchsorted(arrays["timeStamp"], seconds, side="left")
+        if end is not None:
+            if WalletVisualizer._is_block(end):
+                last = np.searchsorted(arrays["blockNumber"], int(end), side="right")
+            else:
+                seconds = int(np.floor(WalletVisualizer._to_timestamp(end, end=True).value / 1e9))
+                last = np.searchsorted(arrays["timeStamp"], seconds, side="right")
+        return {column: arrays[column][first:last] for column in columns or COLUMNS}
+
+    def pair_volumes(self, address, start=None, end=None):
+        """
+        Aggregate transaction volume by (from, to) pair directly from the mapped columns
+
+        Args:
+            address (str): Ethereum wallet address
+            start (int, str, datetime or pandas.Timestamp, optional): First block or earliest time
+            end (int, str, datetime or pandas.Timestamp, optional): Last block or latest time
+
+        Returns:
+            pandas.DataFrame: 'sum' (ETH) and 'count' indexed by (from, to)
+        """
+        with self._locked(address, shared=True):
+            arrays = self._window(address, start, end, ["from", "to", "value"])
+            names = np.char.decode(np.asarray(self._addresses(address)), "ascii")
+
+        keys = arrays["from"].astype("int64") * max(len(names), 1) + arrays["to"]
+        pairs, inverse = np.unique(keys, return_inverse=True)
+        index = pd.MultiIndex.from_arrays([names[pairs // max(len(names), 1)],
+                                           names[pairs % max(len(names), 1)]], names=["from", "to"])
+        return pd.DataFrame({
+            "sum": np.bincount(inverse, weights=arrays["value"], minlength=len(pairs)),
+            "count": np.bincount(inverse, minlength=len(pairs)),
+        }, index=index)
+
+    def read(self, address, columns=None, start=None, end=None):
+        """
+        Read wallet transactions as a DataFrame
+
+        Numeric and time columns reference the mapped files directly. Address
+        columns are categorical; pandas may narrow their per-row codes into a
+        private array of 1-2 bytes per row for small dictionaries. The hash
+        column is only read on request and is decoded into strings.
+
+        Args:
+            address (str): Ethereum wallet address
+            columns (list, optional): Columns to read (default: all but 'hash')
+            start (int, str, datetime or pandas.Timestamp, optional): First block or earliest time
+            end (int, str, datetime or pandas.Timestamp, optional): Last block or latest time
+
+        Returns:
+            pandas.DataFrame: Transaction data in the format of fetch_transactions
+        """
+        with self._locked(address, shared=True):
+            arrays = self._window(address, start, end, columns or READ_COLUMNS)
+            names = np.char.decode(np.asarray(self._addresses(address)), "ascii")
+
+        data = {}
+        for column, array in arrays.items():
+            if column == "timeStamp":
+                data[column] = pd.Series(array.view("datetime64[s]"), copy=False)
+            elif column in ADDRESS_COLUMNS:
+                data[column] = pd.Series(pd.Categorical.from_codes(array, categories=names, validate=False),
+                                         copy=False)
+            elif array.dtype.kind == "S":
+                data[column] = pd.Series(np.char.decode(array, "ascii"), dtype=object)
+            else:
+                data[column] = pd.Series(array, copy=False)
+        return pd.DataFrame(data, copy=False)
+
+    def append(self, address, transactions):
+        """
+        Append transactions newer than the stored ones
+
+        Transactions from blocks before the last stored block are skipped, as are
+        transactions from the last stored block that are already in the log.
+
+        Args:
+            address (str): Ethereum wallet address
+            transactions (pandas.DataFrame): Transactions from fetch_transactions
+
+        Returns:
+            int: Number of appended transactions
+        """
+        with self._locked(address):
+            return self._append(address, transactions)
+
+    def _append(self, address, transactions):
+        """
+        Append transactions, the caller holds the exclusive lock
+        """
+        if transactions is None or transactions.empty:
+            return 0
+
+        transactions = transactions.sort_values("blockNumber", kind="stable")
+        blocks = transactions["blockNumber"].astype("int64")
+
+        n = self.length(address)
+        if n > 0:
+            stored = self._columns(address, ["blockNumber", "hash"])
+            last_block = int(stored["blockNumber"][-1])
+            known = set(stored["hash"][stored["blockNumber"] == last_block].astype(str))
+            keep = (blocks > last_block) | ((blocks == last_block) & ~transactions["hash"].str.lower().isin(known))
+            transactions = transactions[keep.to_numpy()]
+            if transactions.empty:
+                return 0
+
+        os.makedirs(self._wallet_dir(address), exist_ok=True)
+        codes = self._extend_addresses(address, np.concatenate([
+            transactions[column].fillna("").astype(str).str.lower().unique() for column in ADDRESS_COLUMNS]))
+
+        for column, dtype in COLUMNS.items():
+            values = transactions[column]
+            if column == "timeStamp":
+                values = values.astype("datetime64[s]").astype("int64")
+            elif column in ADDRESS_COLUMNS:
+                values = values.fillna("").astype(str).str.lower().map(codes)
+            elif dtype.kind == "S":
+                values = values.fillna("").astype(str).str.lower()
+            self._write_tail(self._column_path(address, column), n * dtype.itemsize,
+                             np.asarray(values, dtype=dtype))
+
+        self._update_rollups(address)
+        return len(transactions)
+
+    def _extend_addresses(self, address, names):
+        """
+        Add addresses to the dictionary before writing codes that refer to them
+
+        Args:
+            address (str): Ethereum wallet address
+            names (iterable): Lowercase addresses
+
+        Returns:
+            dict: Code per address
+        """
+        known = np.char.decode(np.asarray(self._addresses(address)), "ascii")
+        codes = {name: code for code, name in enumerate(known)}
+        new_addresses = []
+        for name in names:
+            if name not in codes:
+                codes[name] = len(codes)
+                new_addresses.append(name)
+        self._write_tail(self._addresses_path(address), len(known) * ADDRESS_DTYPE.itemsize,
+                         np.asarray(new_addresses, dtype=ADDRESS_DTYPE))
+        return codes
+
+    def _append_stored(self, address, source):
+        """
+        Append all stored transactions of a wallet from another log
+
+        Columns are copied as stored, only address codes are translated. The
+        caller holds the exclusive lock and the copied rows follow the stored ones
+        in block order.
+
+        Args:
+            address (str): Ethereum wallet address
+            source (TransactionLog): Log to copy from
+        """
+        arrays = source._columns(address)
+        if len(arrays["blockNumber"]) == 0:
+            return
+
+        os.makedirs(self._wallet_dir(address), exist_ok=True)
+        names = np.char.decode(np.asarray(source._addresses(address)), "ascii")
+        codes = self._extend_addresses(address, names)
+        translate = np.asarray([codes[name] for name in names], dtype=COLUMNS["from"])
+
+        n = self.length(address)
+        for column, dtype in COLUMNS.items():
+            values = translate[arrays[column]] if column in ADDRESS_COLUMNS else arrays[column]
+            self._write_tail(self._column_path(address, column), n * dtype.itemsize,
+                             np.asarray(values, dtype=dtype))
+        self._update_rollups(address)
+
+    @staticmethod
+    def _write_tail(path, size, array):
+        """
+        Append an array to a file, dropping the tail of an interrupted append first
+        """
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+        with open(path, "ab") as f:
+            f.write(array.tobytes())
+
+    def _compute_rollup(self, address, columns, resolution):
+        """
+        Aggregate transactions into periods
+
+        Args:
+            address (str): Ethereum wallet address
+            columns (dict): Column arrays of the transactions
+            resolution (str): 'hour', 'day', 'week' or 'month'
+
+        Returns:
+            pandas.DataFrame: Aggregates indexed by period start
+        """
+        names = np.asarray(self._addresses(address))
+        wallet_codes = np.flatnonzero(names == address.lower().encode())
+        wallet_code = wallet_codes[0] if len(wallet_codes) else -1
+
+        value = np.asarray(columns["value"])
+        incoming = np.asarray(columns["to"]) == wallet_code
+        outgoing = np.asarray(columns["from"]) == wallet_code
+
+        frame = pd.DataFrame({
+            "volume": value,
+            "count": 1,
+            "gas_fee": columns["gasUsed"] * columns["gasPrice"] / 1e9,  # Gwei to ETH
+            "in_volume": np.where(incoming, value, 0.0),
+            "in_count": incoming.astype("int64"),
+            "out_volume": np.where(outgoing, value, 0.0),
+            "out_count": outgoing.astype("int64"),
+        })
+        periods = period_start(pd.Series(np.asarray(columns["timeStamp"]).view("datetime64[s]")), resolution)
+        return frame.groupby(periods.to_numpy()).sum()
+
+    def _load_rollup(self, address, resolution):
+        """
+        Load a stored rollup table
+
+        Returns:
+            tuple: (rollup table, number of transactions it covers)
+        """
+        path = self._rollup_path(address, resolution)
+        if not os.path.exists(path):
+            empty = pd.DataFrame(columns=ROLLUP_FIELDS, dtype=float)
+            empty.index = pd.DatetimeIndex([], name="period")
+            return empty, 0
+        with np.load(path) as data:
+            return pd.DataFrame.from_records(data["records"]).set_index("period"), int(data["rows"])
+
+    def _save_rollup(self, address, resolution, rollup, rows):
+        """
+        Atomically store a rollup table with the number of transactions it covers
+        """
+        path = self._rollup_path(address, resolution)
+        rollup.index.name = "period"
+        records = rollup.to_records(index=True)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, records=records, rows=np.int64(rows))
+        os.replace(path + ".tmp", path)
+
+    def _current_rollup(self, address, resolution):
+        """
+        Get a rollup table covering all stored transactions
+
+        Returns:
+            tuple: (rollup table, whether it differs from the stored one)
+        """
+        rollup, covered = self._load_rollup(address, resolution)
+        n = self.length(address)
+        if covered >= n:
+            return rollup, False
+
+        # Only transactions not covered yet are aggregated and merged into the table
+        new = {column: array[covered:n] for column, array in
+               self._columns(address, ["timeStamp", "from", "to", "value", "gasPrice", "gasUsed"]).items()}
+        part = self._compute_rollup(address, new, resolution)
+        merged = part if rollup.empty else pd.concat([rollup, part]).groupby(level=0).sum()
+        return merged[ROLLUP_FIELDS], True
+
+    def update_rollups(self, address):
+        """
+        Fold transactions not yet covered into the hour, day, week and month rollups
+
+        Only new transactions are aggregated; they are merged into the stored
+        tables, updating the last period and adding new ones. Each table records
+        the number of transactions it covers, so an interrupted update never
+        counts a transaction twice.
+
+        Args:
+            address (str): Ethereum wallet address
+        """
+        with self._locked(address):
+            self._update_rollups(address)
+
+    def _update_rollups(self, address):
+        """
+        Update the stored rollups, the caller holds the exclusive lock
+        """
+        n = self.length(address)
+        for resolution in RESOLUTIONS:
+            rollup, changed = self._current_rollup(address, resolution)
+            if changed:
+                self._save_rollup(address, resolution, rollup, n)
+
+    def rollup(self, address, resolution="day", start=None, end=None):
+        """
+        Get aggregated wallet activity per period
+
+        Periods overlapping the window are returned whole. Nothing is written;
+        transactions not covered by the stored table yet are aggregated on the fly.
+
+        Args:
+            address (str): Ethereum wallet address
+            resolution (str, optional): 'hour', 'day', 'week' or 'month'
+            start (str, datetime or pandas.Timestamp, optional): Earliest time
+            end (str, datetime or pandas.Timestamp, optional): Latest time
+
+        Returns:
+            pandas.DataFrame: volume, count, gas_fee (ETH), in_volume, in_count,
+                out_volume and out_count indexed by period start
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        with self._locked(address, shared=True):
+            rollup, _ = self._current_rollup(address, resolution)
+
+        if start is not None:
+            first = period_start(pd.Series([WalletVisualizer._to_timestamp(start)]), resolution).iloc[0]
+            rollup = rollup[rollup.index >= first]
+        if end is not None:
+            rollup = rollup[rollup.index <= WalletVisualizer._to_timestamp(end, end=True)]
+        return rollup
+
+    def _plan_sync(self, synced, startblock, endblock):
+        """
+        Block range to fetch so the log covers a window
+
+        Args:
+            synced (tuple or None): Currently synced (start_block, end_block)
+            startblock (int): First requested block
+            endblock (int): Last requested block
+
+        Returns:
+            tuple or None: (fetch start, fetch end, rewrite) or None if nothing is missing
+        """
+        if synced is None:
+            return startblock, endblock, True
+        if startblock < synced[0]:
+            # Window extended into the past, fetch only the blocks before the synced ones
+            return startblock, synced[0] - 1, True
+        if endblock > synced[1]:
+            # Incremental sync from the last synced block
+            return synced[1], endblock, False
+        return None
+
+    def sync(self, viz, start=None, end=None):
+        """
+        Bring the log of a wallet up to date
+
+        Only blocks missing from the log are fetched, without holding the lock.
+        Extending the window into the past copies the stored files behind the
+        fetched blocks into a new copy and swaps it in, all other syncs append.
+        If another process synced the wallet meanwhile, the missing range is
+        planned again. Blocks after the chain head are not marked as synced.
+
+        Nothing is loaded into memory: the log is attached to the visualizer,
+        which reads the windows it draws from the log.
+
+        Args:
+            viz (WalletVisualizer): Visualizer of the wallet
+            start (int, str, datetime or pandas.Timestamp, optional): First block or earliest time
+            end (int, str, datetime or pandas.Timestamp, optional): Last block or latest time
+
+        Returns:
+            tuple or None: Synced (start_block, end_block)
+        """
+        startblock, endblock = viz._resolve_window(start, end)
+        if startblock is None:
+            startblock = DEFAULT_END_BLOCK
+
+        head = None
+        while True:
+            synced = self.block_range(viz.address)
+            plan = self._plan_sync(synced, startblock, endblock)
+            if plan is None:
+                break
+            if head is None:
+                # Blocks after the chain head can appear later and are not synced yet
+                head = viz._latest_block()
+                endblock = max(min(endblock, head), startblock)
+                continue
+            fetch_start, fetch_end, rewrite = plan
+            fetched = viz.fetch_transactions(start=fetch_start, end=fetch_end)
+
+            with self._locked(viz.address):
+                if self.block_range(viz.address) != synced:
+                    continue
+                if synced is None:
+                    self._rewrite(viz.address, fetched, (fetch_start, fetch_end))
+                elif rewrite and not fetched.empty:
+                    self._rewrite(viz.address, fetched, (fetch_start, synced[1]), keep=True)
+                elif rewrite:
+                    self._set_block_range(viz.address, fetch_start, synced[1])
+                else:
+                    self._append(viz.address, fetched)
+                    self._set_block_range(viz.address, synced[0], fetch_end)
+
+        # Drop the fetched chunks, windows are read from the log instead
+        if viz.log is None:
+            viz.log = self
+        viz.transactions = None
+        viz._window = None
+        return self.block_range(viz.address)
+
+    def _rewrite(self, address, transactions, block_range, keep=False):
+        """
+        Replace the files of a wallet, the caller holds the exclusive lock
+
+        The new files are written to a temporary directory and swapped in, so a
+        failure leaves the previous history in place.
+
+        Args:
+            address (str): Ethereum wallet address
+            transactions (pandas.DataFrame): Fetched transactions
+            block_range (tuple): Synced (start_block, end_block) of the new files
+            keep (bool, optional): Keep the stored transactions after the fetched ones
+        """
+        tmp_root = os.path.join(self.root, f".tmp-{address.lower()}-{os.getpid()}")
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        try:
+            staging = TransactionLog(tmp_root)
+            staging._append(address, transactions)
+            if keep:
+                staging._append_stored(address, self)
+            os.makedirs(staging._wallet_dir(address), exist_ok=True)
+            staging._set_block_range(address, *block_range)
+
+            wallet_dir = self._wallet_dir(address)
+            old_dir = wallet_dir + ".old"
+            if os.path.isdir(wallet_dir):
+                os.rename(wallet_dir, old_dir)
+            os.rename(staging._wallet_dir(address), wallet_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        finally:
+            shutil.rmtree(tmp_root, ignore_errors=True)
+
+    def remove(self, address):
+        """
+        Delete all stored data of a wallet
+
+        Args:
+            address (str): Ethereum wallet address
+        """
+        with self._locked(address):
+            shutil.rmtree(self._wallet_dir(address), ignore_errors=True)
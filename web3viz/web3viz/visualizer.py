@@ -2,29 +2,73 @@ import requests
 import pandas as pd
 import matplotlib.pyplot as plt
 import networkx as nx
-from datetime import datetime
+from datetime import date, datetime
 import os
+import re
 import matplotlib.dates as mdates
+from matplotlib.collections import LineCollection
 import numpy as np
 
 
+# Default block range used when no window is requested
+DEFAULT_START_BLOCK = 0
+DEFAULT_END_BLOCK = 99999999
+
+# Memo of timestamp -> block number lookups, shared between wallets
+_block_by_time = {}
+
+# Time resolutions of history charts and rollups
+RESOLUTIONS = ("hour", "day", "week", "month")
+
+# Approximate bucket length in days, used for bar widths
+_RESOLUTION_DAYS = {"hour": 1 / 24, "day": 1, "week": 7, "month": 30}
+
+
+def period_start(timestamps, resolution):
+    """
+    Get the start of the period each timestamp falls into
+    
+    Weeks start on Monday, months on the first day of the month.
+    
+    Args:
+        timestamps (pandas.Series): Transaction timestamps
+        resolution (str): 'hour', 'day', 'week' or 'month'
+    
+    Returns:
+        pandas.Series: Period start timestamps
+    """
+    if resolution == "hour":
+        return timestamps.dt.floor("h")
+    if resolution == "day":
+        return timestamps.dt.floor("D")
+    if resolution == "week":
+        return (timestamps - pd.to_timedelta(timestamps.dt.weekday, unit="D")).dt.floor("D")
+    if resolution == "month":
+        return timestamps.dt.to_period("M").dt.start_time
+    raise ValueError(f"Unknown resolution: {resolution}")
+
+
 class WalletVisualizer:
     """
     Class for visualizing Ethereum wallet data
     """
 
-    def __init__(self, address, api_key=None):
+    def __init__(self, address, api_key=None, log=None):
         """
         Initialize visualization object for a wallet
         
         Args:
             address (str): Ethereum wallet address
             api_key (str, optional): Etherscan API key
+            log (TransactionLog, optional): Local transaction log to sync into and read windows from
         """
         self.address = address.lower()
         self.api_key = api_key
+        self.log = log
         self.transactions = None
         self.base_url = "https://api.etherscan.io/api"
+        self._window = None  # (startblock, endblock) covered by self.transactions
+        self.communities = None  # Communities from the last plot_address_network call
         
     def _validate_address(self):
         """
@@ -36,23 +80,295 @@ class WalletVisualizer:
         # Basic check for Ethereum address format
         return self.address.startswith('0x') and len(self.address) == 42
     
-    def fetch_transactions(self):
+    @staticmethod
+    def _is_block(value):
+        """
+        Check whether a window bound is a block number rather than a timestamp
+        
+        Args:
+            value: Window bound
+        
+        Returns:
+            bool: True if value is a block number
+        """
+        return isinstance(value, (int, np.integer)) and not isinstance(value, bool)
+    
+    @staticmethod
+    def _to_timestamp(value, end=False):
+        """
+        Convert a window bound to a naive UTC pandas Timestamp
+        
+        A date without time (e.g. "2024-01-31") used as the end of a window
+        covers the whole day.
+        
+        Args:
+            value (str, datetime or pandas.Timestamp): Window bound
+            end (bool, optional): Whether the bound is the end of a window
+        
+        Returns:
+            pandas.Timestamp: Timestamp in UTC without timezone
+        """
+        ts = pd.Timestamp(value)
+        if ts.tzinfo is not None:
+            ts = ts.tz_convert("UTC").tz_localize(None)
+        
+        date_only = ((isinstance(value, date) and not isinstance(value, datetime))
+                     or (isinstance(value, str) and re.fullmatch(r"\d{4}-\d{2}-\d{2}", value.strip())))
+        if end and date_only:
+            ts += pd.Timedelta(days=1) - pd.Timedelta(1, unit="ns")
+        return ts
+    
+    def _latest_block(self):
+        """
+        Get the number of the newest block through Etherscan API
+        
+        Returns:
+            int: Block number of the chain head
+        """
+        params = {"module": "proxy", "action": "eth_blockNumber"}
+        if self.api_key:
+            params["apikey"] = self.api_key
+        
+        try:
+            response = requests.get(self.base_url, params=params)
+            response.raise_for_status()
+            data = response.json()
+        except requests.RequestException as e:
+            raise ConnectionError(f"Error connecting to Etherscan API: {str(e)}")
+        
+        if "result" not in data or not str(data["result"]).startswith("0x"):
+            raise Exception(f"Etherscan API error: {data.get('message', data.get('result'))}")
+        return int(data["result"], 16)
+    
+    def _block_by_timestamp(self, value, closest):
+        """
+        Map a timestamp to a block number through Etherscan API
+        
+        Results are memoized, so every timestamp is resolved only once.
+        
+        Args:
+            value (str, datetime or pandas.Timestamp): Timestamp to resolve
+            closest (str): "before" or "after"
+        
+        Returns:
+            int: Block number
+        """
+        seconds = int(self._to_timestamp(value).timestamp())
+        
+        # Timestamps in the future are not known to Etherscan yet
+        if seconds >= int(datetime.now().timestamp()):
+            return DEFAULT_END_BLOCK if closest == "before" else None
+        
+        key = (seconds, closest)
+        if key in _block_by_time:
+            return _block_by_time[key]
+        
+        params = {
+            "module": "block",
+            "action": "getblocknobytime",
+            "timestamp": seconds,
+            "closest": closest,
+        }
+        if self.api_key:
+            params["apikey"] = self.api_key
+        
+        try:
+            response = requests.get(self.base_url, params=params)
+            response.raise_for_status()
+            data = response.json()
+        except requests.RequestException as e:
+            raise ConnectionError(f"Error connecting to Etherscan API: {str(e)}")
+        
+        if data["status"] != "1":
+            raise Exception(f"Etherscan API error: {data['message']}")
+        
+        block = int(data["result"])
+        _block_by_time[key] = block
+        return block
+    
+    def _resolve_window(self, start=None, end=None):
+        """
+        Convert window bounds to a block range
+        
+        Args:
+            start (int, str, datetime or pandas.Timestamp, optional): First block or earliest time
+            end (int, str, datetime or pandas.Timestamp, optional): Last block or latest time
+        
+        Returns:
+            tuple: (startblock, endblock)
+        """
+        if start is None:
+            startblock = DEFAULT_START_BLOCK
+        elif self._is_block(start):
+            startblock = int(start)
+        else:
+            startblock = self._block_by_timestamp(start, "after")
+        
+        if end is None:
+            endblock = DEFAULT_END_BLOCK
+        elif self._is_block(end):
+            endblock = int(end)
+        else:
+            endblock = self._block_by_timestamp(self._to_timestamp(end, end=True), "before")
+        
+        return startblock, endblock
+    
+    def _slice_window(self, transactions, start=None, end=None):
+        """
+        Select transactions within a window
+        
+        Block bounds are matched against 'blockNumber', time bounds against 'timeStamp'.
+        
+        Args:
+            transactions (pandas.DataFrame): Transaction data
+            start (int, str, datetime or pandas.Timestamp, optional): First block or earliest time
+            end (int, str, datetime or pandas.Timestamp, optional): Last block or latest time
+        
+        Returns:
+            pandas.DataFrame: Transactions within the window
+        """
+        mask = pd.Series(True, index=transactions.index)
+        for bound, is_start in ((start, True), (end, False)):
+            if bound is None:
+                continue
+            if self._is_block(bound):
+                column = pd.to_numeric(transactions["blockNumber"])
+                bound = int(bound)
+            else:
+                column = transactions["timeStamp"]
+                bound = self._to_timestamp(bound, end=not is_start)
+            mask &= (column >= bound) if is_start else (column <= bound)
+        return transactions[mask]
+    
+    def _fetch_window(self, start=None, end=None):
+        """
+        Fetch a window, through the transaction log if one is set
+        
+        Args:
+            start (int, str, datetime or pandas.Timestamp, optional): First block or earliest time
+            end (int, str, datetime or pandas.Timestamp, optional): Last block or latest time
+        """
+        if self.log is not None:
+            self.log.sync(self, start=start, end=end)
+        else:
+            self.fetch_transactions(start=start, end=end)
+    
+    def _ensure_window(self, start=None, end=None):
+        """
+        Make sure transactions of a window are loaded, fetching only if needed
+        
+        With a transaction log, the window is synced if the log does not cover it.
+        
+        Args:
+            start (int, str, datetime or pandas.Timestamp, optional): First block or earliest time
+            end (int, str, datetime or pandas.Timestamp, optional): Last block or latest time
+        """
+        if self.log is not None:
+            synced = self.log.block_range(self.address)
+            startblock, endblock = self._resolve_window(start, end)
+            if synced is None or startblock is None or startblock < synced[0] or endblock > synced[1]:
+                self.log.sync(self, start=start, end=end)
+        elif self.transactions is None or (self.transactions.empty and self._window is None):
+            self._fetch_window(start, end)
+        elif self._window is not None and self._window != (DEFAULT_START_BLOCK, DEFAULT_END_BLOCK):
+            # Refetch if the requested window, the full history included, is outside the loaded one
+            startblock, endblock = self._resolve_window(start, end)
+            if startblock is None or startblock < self._window[0] or endblock > self._window[1]:
+                self._fetch_window(start, end)
+    
+    def _load_window(self, start=None, end=None, sync=True):
+        """
+        Get transactions within a window, fetching only what is not loaded yet
+        
+        Args:
+            start (int, str, datetime or pandas.Timestamp, optional): First block or earliest time
+            end (int, str, datetime or pandas.Timestamp, optional): Last block or latest time
+            sync (bool, optional): With a transaction log, sync the window if the log
+                does not cover it; otherwise read only what is stored
+        
+        Returns:
+            pandas.DataFrame: Transactions within the window
+        """
+        if self.log is None or sync:
+            self._ensure_window(start, end)
+        
+        if self.log is not None:
+            return self.log.read(self.address, start=start, end=end)
+        if self.transactions.empty:
+            return self.transactions
+        return self._slice_window(self.transactions, start, end)
+    
+    def _auto_resolution(self, start=None, end=None, transactions=None):
+        """
+        Choose the coarsest resolution that still shows the window in detail
+        
+        The span is measured on the transactions within the window, so a window
+        reaching far beyond the wallet's activity still shows it in detail.
+        
+        Args:
+            start (int, str, datetime or pandas.Timestamp, optional): First block or earliest time
+            end (int, str, datetime or pandas.Timestamp, optional): Last block or latest time
+            transactions (pandas.DataFrame, optional): Transactions within the window,
+                by default they are taken from the transaction log
+        
+        Returns:
+            str: 'hour', 'day', 'week' or 'month'
+        """
+        if transactions is not None:
+            timestamps = transactions["timeStamp"].to_numpy() if not transactions.empty else []
+        else:
+            timestamps = self.log.window(self.address, start, end, ["timeStamp"])["timeStamp"].view("datetime64[s]")
+        if len(timestamps) == 0:
+            return "day"
+        
+        first, last = pd.Timestamp(timestamps.min()), pd.Timestamp(timestamps.max())
+        if start is not None and not self._is_block(start):
+            first = max(first, self._to_timestamp(start))
+        if end is not None and not self._is_block(end):
+            last = min(last, self._to_timestamp(end, end=True))
+        
+        span = last - first
+        if span <= pd.Timedelta(days=3):
+            return "hour"
+        if span <= pd.Timedelta(days=2 * 365):
+            return "day"
+        if span <= pd.Timedelta(days=10 * 365):
+            return "week"
+        return "month"
+    
+    def fetch_transactions(self, start=None, end=None):
         """
         Get transaction data through Etherscan API
         
+        Window bounds may be block numbers (int) or timestamps (str, datetime,
+        pandas.Timestamp). Timestamps are mapped to blocks with Etherscan's
+        getblocknobytime, so only the requested block range is downloaded.
+        
+        Args:
+            start (int, str, datetime or pandas.Timestamp, optional): First block or earliest time
+            end (int, str, datetime or pandas.Timestamp, optional): Last block or latest time
+        
         Returns:
             pandas.DataFrame: Transaction data
         """
         if not self._validate_address():
             raise ValueError(f"Invalid Ethereum address: {self.address}")
         
+        startblock, endblock = self._resolve_window(start, end)
+        
+        # Window starts in the future, nothing to fetch
+        if startblock is None:
+            self.transactions = pd.DataFrame()
+            self._window = None
+            return self.transactions
+        
         # Parameters for requesting normal transactions
         params = {
             "module": "account",
             "action": "txlist",
             "address": self.address,
-            "startblock": 0,
-            "endblock": 99999999,
+            "startblock": startblock,
+            "endblock": endblock,
             "sort": "asc"
         }
         
@@ -66,17 +382,21 @@ class WalletVisualizer:
             response.raise_for_status()  # Check for HTTP errors
             data = response.json()
             
-            if data["status"] != "1":
+            # Etherscan reports an empty block range as an error
+            if data["status"] != "1" and data["message"] != "No transactions found":
                 raise Exception(f"Etherscan API error: {data['message']}")
                 
             # Convert response to DataFrame
-            transactions = pd.DataFrame(data["result"])
+            transactions = pd.DataFrame(data["result"] or [])
             
             # If no transactions
             if transactions.empty:
-                return pd.DataFrame()
+                self.transactions = pd.DataFrame()
+                self._window = (startblock, endblock)
+                return self.transactions
                 
             # Convert data types
+            transactions["blockNumber"] = transactions["blockNumber"].astype(int)
             transactions["timeStamp"] = pd.to_datetime(transactions["timeStamp"].astype(int), unit="s")
             transactions["value"] = transactions["value"].astype(float) / 1e18  # Convert Wei to ETH
             transactions["gasPrice"] = transactions["gasPrice"].astype(float) / 1e9  # Convert Wei to Gwei
@@ -84,6 +404,7 @@ class WalletVisualizer:
             transactions["gasUsed"] = transactions["gasUsed"].astype(int)
             
             self.transactions = transactions
+            self._window = (startblock, endblock)
             return transactions
             
         except requests.RequestException as e:
@@ -91,30 +412,55 @@ class WalletVisualizer:
         except Exception as e:
             raise Exception(f"Error fetching transaction data: {str(e)}")
     
-    def plot_transaction_history(self, save_path=None):
+    def plot_transaction_history(self, save_path=None, start=None, end=None, resolution='day',
+                                 sync=True):
         """
         Plot transaction history over time
         
+        With a transaction log, time windows are read from its precomputed rollups
+        and cover whole periods at the chosen resolution.
+        
         Args:
             save_path (str, optional): Path to save the image
+            start (int, str, datetime or pandas.Timestamp, optional): First block or earliest time
+            end (int, str, datetime or pandas.Timestamp, optional): Last block or latest time
+            resolution (str, optional): 'hour', 'day', 'week', 'month' or 'auto'
+            sync (bool, optional): With a transaction log, sync the window first if the
+                log does not cover it; otherwise draw only what is stored
         """
-        # Check if transactions are loaded
-        if self.transactions is None or self.transactions.empty:
-            self.fetch_transactions()
+        if resolution != 'auto' and resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        
+        if self.log is not None and not self._is_block(start) and not self._is_block(end):
+            if sync:
+                self._ensure_window(start, end)
+            if resolution == 'auto':
+                resolution = self._auto_resolution(start, end)
             
-        if self.transactions.empty:
-            raise ValueError(f"No transaction data for address {self.address}")
+            # Answer from the rollup instead of raw transactions
+            rollup = self.log.rollup(self.address, resolution, start, end)
+            if rollup.empty:
+                raise ValueError(f"No transaction data for address {self.address}")
+            volumes, counts = rollup['volume'], rollup['count']
+        else:
+            # Load only the requested window
+            transactions = self._load_window(start, end, sync=sync)
+            if transactions.empty:
+                raise ValueError(f"No transaction data for address {self.address}")
+            if resolution == 'auto':
+                resolution = self._auto_resolution(start, end, transactions)
             
-        # Group transactions by day and sum values
-        daily_volumes = self.transactions.groupby(self.transactions['timeStamp'].dt.date)['value'].sum()
-        daily_counts = self.transactions.groupby(self.transactions['timeStamp'].dt.date).size()
+            # Group transactions by period and sum values
+            periods = period_start(transactions['timeStamp'], resolution)
+            volumes = transactions.groupby(periods)['value'].sum()
+            counts = transactions.groupby(periods).size()
         
         # Create figure with two Y axes
         fig, ax1 = plt.subplots(figsize=(12, 6))
         ax2 = ax1.twinx()
         
         # Plot transaction volume (in ETH)
-        ax1.plot(daily_volumes.index, daily_volumes.values, 'b-', label='Volume (ETH)')
+        ax1.plot(volumes.index, volumes.values, 'b-', label='Volume (ETH)')
         ax1.set_xlabel('Date')
         ax1.set_ylabel('Transaction Volume (ETH)', color='b')
         ax1.tick_params(axis='y', labelcolor='b')
@@ -124,7 +470,8 @@ class WalletVisualizer:
         ax1.xaxis.set_major_locator(mdates.AutoDateLocator())
         
         # Plot transaction count
-        ax2.bar(daily_counts.index, daily_counts.values, alpha=0.3, color='r', label='Count')
+        ax2.bar(counts.index, counts.values, width=_RESOLUTION_DAYS[resolution] * 0.8,
+                alpha=0.3, color='r', label='Count')
         ax2.set_ylabel('Transaction Count', color='r')
         ax2.tick_params(axis='y', labelcolor='r')
         
@@ -150,25 +497,122 @@ class WalletVisualizer:
             plt.show()
             return fig
     
-    def plot_address_network(self, depth=1, save_path=None, max_addresses=50):
+    @staticmethod
+    def _prune_edges(G, min_edge_weight=None, edge_percentile=None):
         """
-        Plot the network of interactions with other addresses
+        Remove low-volume edges from the graph
         
         Args:
-            depth (int, optional): Network depth (not used yet)
-            save_path (str, optional): Path to save the image
-            max_addresses (int, optional): Maximum number of addresses in visualization
+            G (networkx.DiGraph): Interaction graph
+            min_edge_weight (float, optional): Minimum edge volume in ETH
+            edge_percentile (float, optional): Drop edges below this volume percentile (0-100)
+        """
+        threshold = min_edge_weight if min_edge_weight is not None else -np.inf
+        if edge_percentile is not None and G.number_of_edges() > 0:
+            weights = [data['weight'] for _, _, data in G.edges(data=True)]
+            threshold = max(threshold, np.percentile(weights, edge_percentile))
+        
+        weak_edges = [(u, v) for u, v, data in G.edges(data=True) if data['weight'] < threshold]
+        G.remove_edges_from(weak_edges)
+    
+    @staticmethod
+    def _merge_reverse_edges(G):
+        """
+        Merge opposite edges between two addresses into one edge with net flow
+        
+        The merged edge points in the direction of the net flow. Its 'weight' is
+        the total volume in both directions and 'net' is the absolute net flow.
+        
+        Args:
+            G (networkx.DiGraph): Interaction graph
         
         Returns:
-            matplotlib.Figure or str: Chart or path to saved file
+            networkx.DiGraph: Graph without reverse edge pairs
         """
-        # Check if transactions are loaded
-        if self.transactions is None or self.transactions.empty:
-            self.fetch_transactions()
+        merged = nx.DiGraph()
+        merged.add_nodes_from(G.nodes(data=True))
+        
+        for u, v, data in G.edges(data=True):
+            if merged.has_edge(u, v) or merged.has_edge(v, u):
+                continue
             
-        if self.transactions.empty:
-            raise ValueError(f"No transaction data for address {self.address}")
+            reverse = G.get_edge_data(v, u) if u != v else None
+            if reverse is None:
+                merged.add_edge(u, v, **data, net=data['weight'], bidirectional=False)
+                continue
             
+            net = data['weight'] - reverse['weight']
+            from_addr, to_addr = (u, v) if net >= 0 else (v, u)
+            merged.add_edge(from_addr, to_addr,
+                            weight=data['weight'] + reverse['weight'],
+                            count=data['count'] + reverse['count'],
+                            net=abs(net), bidirectional=True,
+                            from_addr=from_addr, to_addr=to_addr)
+        
+        return merged
+    
+    @staticmethod
+    def _draw_edge_collection(G, pos, widths, color='gray', alpha=0.6):
+        """
+        Draw all graph edges as a single LineCollection
+        
+        Much faster than per-edge arrow patches for dense graphs. Instead of
+        arrows, a marker near the target end of each edge shows its direction.
+        
+        Args:
+            G (networkx.DiGraph): Interaction graph
+            pos (dict): Node positions
+            widths (list): Line width for each edge
+            color (str, optional): Edge color
+            alpha (float, optional): Edge transparency
+        
+        Returns:
+            matplotlib.collections.LineCollection: Drawn edges
+        """
+        segments = [(pos[u], pos[v]) for u, v in G.edges()]
+        edges = LineCollection(segments, linewidths=widths, colors=color, alpha=alpha, zorder=1)
+        ax = plt.gca()
+        ax.add_collection(edges)
+        
+        # Direction markers, drawn as a single collection as well
+        heads = [(np.asarray(pos[u]) + 0.85 * (np.asarray(pos[v]) - np.asarray(pos[u])), width)
+                 for (u, v), width in zip(G.edges(), widths) if u != v]
+        if heads:
+            points = np.array([point for point, _ in heads])
+            ax.scatter(points[:, 0], points[:, 1], s=[10 + 10 * width for _, width in heads],
+                       c=color, alpha=alpha, zorder=1)
+        
+        ax.autoscale_view()
+        return edges
+    
+    @staticmethod
+    def _pair_volumes(transactions):
+        """
+        Aggregate transaction volume by (from, to) pair
+        
+        Args:
+            transactions (pandas.DataFrame): Transaction data
+        
+        Returns:
+            pandas.DataFrame: 'sum' (ETH) and 'count' indexed by (from, to)
+        """
+        return pd.DataFrame({
+            'from': transactions['from'].astype(str).str.lower(),
+            'to': transactions['to'].astype(str).str.lower(),
+            'value': transactions['value'].astype(float),
+        }).groupby(['from', 'to'])['value'].agg(['sum', 'count'])
+    
+    def _build_network_graph(self, pairs, max_addresses=None):
+        """
+        Build the weighted interaction graph from pair volumes
+        
+        Args:
+            pairs (pandas.DataFrame): Volumes by (from, to) pair, see _pair_volumes
+            max_addresses (int, optional): Keep only the top addresses by volume
+        
+        Returns:
+            networkx.DiGraph: Graph with 'weight' (ETH) and 'count' on edges
+        """
         # Create directed graph
         G = nx.DiGraph()
         
@@ -176,26 +620,21 @@ class WalletVisualizer:
         G.add_node(self.address, size=20, color='red', label=f"{self.address[:6]}...{self.address[-4:]}")
         
         # Get all unique addresses our wallet has interacted with
-        from_addresses = set(self.transactions['from'].str.lower())
-        to_addresses = set(self.transactions['to'].str.lower())
-        all_addresses = (from_addresses | to_addresses) - {self.address.lower()}
+        from_addresses = set(pairs.index.get_level_values('from'))
+        to_addresses = set(pairs.index.get_level_values('to'))
+        all_addresses = (from_addresses | to_addresses) - {self.address}
         
         # Limit the number of nodes for graph readability
-        if len(all_addresses) > max_addresses:
+        if max_addresses is not None and len(all_addresses) > max_addresses:
             # Find top addresses by transaction volume
             volume_by_address = {}
             
-            # Sum outgoing transaction volumes by recipient addresses
-            for _, tx in self.transactions[self.transactions['from'] == self.address].iterrows():
-                to_addr = tx['to'].lower()
-                value = float(tx['value'])
-                volume_by_address[to_addr] = volume_by_address.get(to_addr, 0) + value
-                
-            # Sum incoming transaction volumes by sender addresses
-            for _, tx in self.transactions[self.transactions['to'] == self.address].iterrows():
-                from_addr = tx['from'].lower()
-                value = float(tx['value'])
-                volume_by_address[from_addr] = volume_by_address.get(from_addr, 0) + value
+            for (from_addr, to_addr), row in pairs.iterrows():
+                # Outgoing volume by recipient, incoming volume by sender
+                if from_addr == self.address:
+                    volume_by_address[to_addr] = volume_by_address.get(to_addr, 0) + row['sum']
+                if to_addr == self.address:
+                    volume_by_address[from_addr] = volume_by_address.get(from_addr, 0) + row['sum']
                 
             # Sort addresses by transaction volume and take top_n
             top_addresses = sorted(volume_by_address.items(), key=lambda x: x[1], reverse=True)[:max_addresses]
@@ -205,19 +644,197 @@ class WalletVisualizer:
         for address in all_addresses:
             G.add_node(address, size=10, color='blue', label=f"{address[:6]}...{address[-4:]}")
         
-        # Add edges for transactions
-        for _, tx in self.transactions.iterrows():
-            from_addr = tx['from'].lower()
-            to_addr = tx['to'].lower()
-            
+        # Add edges for transactions, aggregated by (from, to) pair
+        for (from_addr, to_addr), row in pairs.iterrows():
             # Check that both addresses are in our graph (one might be filtered out)
             if from_addr in G.nodes and to_addr in G.nodes:
-                # If edge already exists, increase its weight
-                if G.has_edge(from_addr, to_addr):
-                    G[from_addr][to_addr]['weight'] += float(tx['value'])
-                    G[from_addr][to_addr]['count'] += 1
-                else:
-                    G.add_edge(from_addr, to_addr, weight=float(tx['value']), count=1, from_addr=from_addr, to_addr=to_addr)
+                G.add_edge(from_addr, to_addr, weight=float(row['sum']), count=int(row['count']),
+                           from_addr=from_addr, to_addr=to_addr)
+        
+        return G
+    
+    def _counterparty_similarity(self, G, neighbors=10):
+        """
+        Build a graph linking counterparties with similar flows to the wallet
+        
+        A wallet's transaction list only holds transactions with the wallet
+        itself, so counterparties are never linked to each other. Instead each
+        counterparty is described by its log-scaled incoming and outgoing volume
+        and count, and linked to its nearest neighbors in that feature space.
+        
+        Args:
+            G (networkx.DiGraph): Interaction graph
+            neighbors (int, optional): Number of nearest neighbors per counterparty
+        
+        Returns:
+            networkx.Graph: Counterparties linked with similarity weights in (0, 1]
+        """
+        nodes = [node for node in G.nodes() if node != self.address]
+        H = nx.Graph()
+        H.add_nodes_from(nodes)
+        if len(nodes) < 2:
+            return H
+        
+        features = np.zeros((len(nodes), 4))
+        for i, node in enumerate(nodes):
+            incoming = G.get_edge_data(node, self.address, default={})
+            outgoing = G.get_edge_data(self.address, node, default={})
+            features[i] = [incoming.get('weight', 0.0), incoming.get('count', 0),
+                           outgoing.get('weight', 0.0), outgoing.get('count', 0)]
+        features = np.log1p(features)
+        
+        # Standardize so volume and count weigh the same
+        scale = features.std(axis=0)
+        features = (features - features.mean(axis=0)) / np.where(scale > 0, scale, 1.0)
+        
+        # Nearest neighbors, in chunks to bound memory for large wallets
+        k = min(neighbors, len(nodes) - 1)
+        norms = (features ** 2).sum(axis=1)
+        for begin in range(0, len(nodes), 256):
+            chunk = features[begin:begin + 256]
+            squared = np.maximum(norms[begin:begin + 256, None] + norms[None, :] - 2 * chunk @ features.T, 0)
+            squared[np.arange(len(chunk)), np.arange(begin, begin + len(chunk))] = np.inf
+            nearest = np.argpartition(squared, k - 1, axis=1)[:, :k]
+            for row, columns in enumerate(nearest):
+                for column in columns:
+                    H.add_edge(nodes[begin + row], nodes[column],
+                               weight=float(np.exp(-squared[row, column])))
+        return H
+    
+    def _detect_communities(self, G, method='louvain'):
+        """
+        Group counterparties into communities
+        
+        Communities are detected on a similarity graph of the counterparties
+        (see _counterparty_similarity), so counterparties with similar flows to
+        and from the wallet end up in the same community.
+        
+        Args:
+            G (networkx.DiGraph): Interaction graph
+            method (str, optional): 'louvain' or 'label_propagation'
+        
+        Returns:
+            list: Sets of addresses, ordered by total volume (largest first)
+        """
+        if method not in ('louvain', 'label_propagation'):
+            raise ValueError(f"Unknown community detection method: {method}")
+        
+        H = self._counterparty_similarity(G)
+        if H.number_of_edges() == 0:
+            groups = [set(H.nodes())] if H.number_of_nodes() else []
+        elif method == 'louvain':
+            groups = [set(c) for c in nx.community.louvain_communities(H, weight='weight', seed=0)]
+        else:
+            groups = [set(c) for c in nx.community.asyn_lpa_communities(H, weight='weight', seed=0)]
+        
+        node_volume = dict(G.degree(weight='weight'))
+        return sorted(groups, key=lambda group: sum(node_volume[n] for n in group), reverse=True)
+    
+    def _collapse_communities(self, G, communities):
+        """
+        Replace each community with a super-node
+        
+        Super-nodes carry 'members', 'volume' (ETH) and 'count'. Edges between
+        communities and the wallet are aggregated, edges inside a community are
+        counted in its volume only.
+        
+        Args:
+            G (networkx.DiGraph): Interaction graph
+            communities (list): Sets of addresses
+        
+        Returns:
+            networkx.DiGraph: Graph of the wallet and community super-nodes
+        """
+        node_to_group = {self.address: self.address}
+        collapsed = nx.DiGraph()
+        collapsed.add_node(self.address, **G.nodes[self.address])
+        
+        for i, members in enumerate(communities):
+            name = f"community_{i}"
+            collapsed.add_node(name, members=members, volume=0.0, count=0,
+                               label=f"C{i} ({len(members)} addr)")
+            for member in members:
+                node_to_group[member] = name
+        
+        for u, v, data in G.edges(data=True):
+            gu, gv = node_to_group[u], node_to_group[v]
+            for group in {gu, gv} - {self.address}:
+                collapsed.nodes[group]['volume'] += data['weight']
+                collapsed.nodes[group]['count'] += data['count']
+            if gu == gv:
+                continue
+            if collapsed.has_edge(gu, gv):
+                collapsed[gu][gv]['weight'] += data['weight']
+                collapsed[gu][gv]['count'] += data['count']
+            else:
+                collapsed.add_edge(gu, gv, weight=data['weight'], count=data['count'],
+                                   from_addr=gu, to_addr=gv)
+        
+        return collapsed
+    
+    def plot_address_network(self, depth=1, save_path=None, max_addresses=50, start=None, end=None,
+                             min_edge_weight=None, edge_percentile=None, merge_reverse=False,
+                             fast_edges=False, communities=None, community=None, sync=True):
+        """
+        Plot the network of interactions with other addresses
+        
+        Args:
+            depth (int, optional): Network depth (not used yet)
+            save_path (str, optional): Path to save the image
+            max_addresses (int, optional): Maximum number of addresses in visualization
+            start (int, str, datetime or pandas.Timestamp, optional): First block or earliest time
+            end (int, str, datetime or pandas.Timestamp, optional): Last block or latest time
+            min_edge_weight (float, optional): Hide edges with less volume (ETH)
+            edge_percentile (float, optional): Hide edges below this volume percentile (0-100)
+            merge_reverse (bool, optional): Merge opposite edges into one edge with net flow,
+                edge width then shows the net flow
+            fast_edges (bool, optional): Draw edges as a single LineCollection with direction
+                markers instead of arrows
+            communities (str, optional): Collapse counterparties into communities
+                ('louvain' or 'label_propagation') instead of keeping the top max_addresses
+            community (int, optional): Draw the members of this community only
+            sync (bool, optional): With a transaction log, sync the window first if the
+                log does not cover it; otherwise draw only what is stored
+        
+        Returns:
+            matplotlib.Figure or str: Chart or path to saved file
+        """
+        if self.log is not None:
+            if sync:
+                self._ensure_window(start, end)
+            # Aggregate straight from the mapped log columns
+            pairs = self.log.pair_volumes(self.address, start, end)
+        else:
+            transactions = self._load_window(start, end)
+            pairs = self._pair_volumes(transactions) if not transactions.empty else None
+            
+        if pairs is None or pairs.empty:
+            raise ValueError(f"No transaction data for address {self.address}")
+            
+        if communities is None:
+            G = self._build_network_graph(pairs, max_addresses)
+        else:
+            # Keep every counterparty and reduce the graph by communities instead
+            G = self._build_network_graph(pairs)
+            self.communities = self._detect_communities(G, communities)
+            if community is None:
+                G = self._collapse_communities(G, self.communities)
+            else:
+                if not 0 <= community < len(self.communities):
+                    raise ValueError(f"Community {community} not found, "
+                                     f"{len(self.communities)} communities detected")
+                # Keep the top max_addresses members by volume
+                members = self.communities[community]
+                if max_addresses is not None and len(members) > max_addresses:
+                    volume = dict(G.degree(weight='weight'))
+                    members = sorted(members, key=lambda node: volume[node], reverse=True)[:max_addresses]
+                G = G.subgraph(set(members) | {self.address}).copy()
+        
+        # Merge opposite directions if requested, then drop weak edges
+        # Merging first keeps the net flow of pairs with one weak direction
+        if merge_reverse:
+            G = self._merge_reverse_edges(G)
+        self._prune_edges(G, min_edge_weight, edge_percentile)
         
         # Configure node sizes based on transaction count
         sizes = []
@@ -229,18 +846,22 @@ class WalletVisualizer:
             if node.lower() == self.address.lower():
                 sizes.append(2000)  # Main node is larger than others
                 colors.append('red')
+            elif 'members' in node_data:
+                # Community size is proportional to number of members
+                sizes.append(500 + np.log1p(len(node_data['members'])) * 300)
+                colors.append('orange')
             else:
                 # Node size is proportional to transaction count
-                tx_count = sum(1 for u, v, data in G.edges(data=True) 
-                               if u == node or v == node)
-                sizes.append(500 + tx_count * 100)
+                sizes.append(500 + G.degree(node) * 100)
                 colors.append('skyblue')
             
             # Add labels with shortened addresses
             labels[node] = node_data.get('label', f"{node[:6]}...{node[-4:]}")
         
         # Configure edge weights based on transaction volume
-        edge_weights = [np.log1p(data['weight']) * 0.5 for _, _, data in G.edges(data=True)]
+        # Merged edges show the net flow in their direction
+        weight_key = 'net' if merge_reverse else 'weight'
+        edge_weights = [np.log1p(data[weight_key]) * 0.5 for _, _, data in G.edges(data=True)]
         
         # Create figure
         plt.figure(figsize=(12, 12))
@@ -252,8 +873,11 @@ class WalletVisualizer:
         nx.draw_networkx_nodes(G, pos, node_size=sizes, node_color=colors, alpha=0.8)
         
         # Draw edges with varying thickness based on weight
-        nx.draw_networkx_edges(G, pos, width=edge_weights, alpha=0.6, arrows=True, 
-                              arrowsize=15, arrowstyle='->', edge_color='gray')
+        if fast_edges:
+            self._draw_edge_collection(G, pos, edge_weights)
+        else:
+            nx.draw_networkx_edges(G, pos, width=edge_weights, alpha=0.6, arrows=True, 
+                                  arrowsize=15, arrowstyle='->', edge_color='gray')
         
         # Add node labels
         nx.draw_networkx_labels(G, pos, labels=labels, font_size=8, font_family='sans-serif')